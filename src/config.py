@@ -11,6 +11,7 @@ import os
 import sys
 import base64
 import shutil
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
@@ -37,6 +38,7 @@ def get_user_data_dir(app_name: str = APP_NAME) -> Path:
     except Exception:
         return Path.cwd().resolve()
 
+@lru_cache(maxsize=256)
 def get_resource_path(relative_path: str) -> str:
     try:
         base = Path(sys._MEIPASS)  # type: ignore
@@ -1,7 +1,6 @@
 # gui/theme.py
 import tkinter as tk
 from tkinter import ttk
-import matplotlib as mpl
 
 # Paramètres de style
 GLOBAL_FONT_FAMILY = "Segoe UI"
@@ -51,6 +50,8 @@ def apply_matplotlib_theme():
     Appelle ceci avant l'instanciation de Figures.
     """
     try:
+        # import différé : appliquer le thème Tk ne doit pas charger matplotlib
+        import matplotlib as mpl
         mpl.rcParams["font.family"] = GLOBAL_FONT_FAMILY
         mpl.rcParams["font.size"] = GLOBAL_FONT_SIZE
         mpl.rcParams["axes.titlesize"] = GLOBAL_FONT_SIZE + 4
@@ -14,7 +14,7 @@ import uuid
 import hashlib
 import secrets
 import string
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 
 # --- Config import (robuste) ---
 try:
@@ -96,11 +96,17 @@ def encrypt_key(plain_key: str) -> Optional[str]:
     except Exception:
         return None
 
-def decrypt_key(enc_key: str) -> Optional[str]:
+def _to_fernet_bytes(token: Union[str, bytes]) -> bytes:
+    """Token Fernet (ASCII base64 urlsafe) sous forme de bytes, converti une seule fois."""
+    if isinstance(token, bytes):
+        return token
+    return token.encode("ascii")
+
+def decrypt_key(enc_key: Union[str, bytes]) -> Optional[str]:
     if not _HAS_FERNET or not _FERNET:
         return None
     try:
-        return _FERNET.decrypt(enc_key.encode("utf-8")).decode("utf-8")
+        return _FERNET.decrypt(_to_fernet_bytes(enc_key)).decode("utf-8")
     except Exception:
         return None
 
@@ -296,16 +302,24 @@ def validate_encrypted_input(encrypted_input: str, path: Optional[str] = None) -
         return False
     return validate_key_plain(plain, path=path)
 
-def consume_encrypted_input(encrypted_input: str, used_by: Optional[str] = None, path: Optional[str] = None) -> bool:
+def consume_encrypted_input_checked(encrypted_input: str, used_by: Optional[str] = None,
+                                    path: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Déchiffre le token une seule fois puis consomme la clé.
+    Retourne (ok, plain) : plain est None si le token n'est pas déchiffrable.
+    """
     if not _HAS_FERNET:
-        return False
+        return False, None
     try:
-        plain = decrypt_key(encrypted_input)
+        plain = decrypt_key(_to_fernet_bytes(encrypted_input))
     except Exception:
-        return False
+        return False, None
     if not plain:
-        return False
-    return consume_key_plain(plain, used_by=used_by, path=path)
+        return False, None
+    return consume_key_plain(plain, used_by=used_by, path=path), plain
+
+def consume_encrypted_input(encrypted_input: str, used_by: Optional[str] = None, path: Optional[str] = None) -> bool:
+    return consume_encrypted_input_checked(encrypted_input, used_by=used_by, path=path)[0]
 
 def revoke_key(plain_key: str, reason: Optional[str] = None, revoked_by: Optional[str] = None, path: Optional[str] = None) -> bool:
     conn = _get_conn(path)
@@ -5,7 +5,7 @@ Expose connect_sqlcipher(db_path, passphrase).
 """
 
 import logging
-from typing import Any
+from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +20,25 @@ def _get_sqlcipher_module():
         except Exception:
             return None
 
-def connect_sqlcipher(db_path: str, passphrase: str, timeout: float = 5.0) -> Any:
+def connect_sqlcipher(db_path: str, passphrase: str, timeout: float = 5.0,
+                      cipher_memory_security: bool = False,
+                      cipher_page_size: Optional[int] = 4096,
+                      kdf_iter: Optional[int] = None,
+                      cache_size_kib: Optional[int] = 65536,
+                      journal_mode: Optional[str] = "WAL",
+                      synchronous: Optional[str] = "NORMAL",
+                      temp_store_memory: bool = True) -> Any:
     """
-    Ouvre une connexion SQLCipher et applique PRAGMA key.
+    Ouvre une connexion SQLCipher et applique PRAGMA key, puis les réglages de performance.
     Lève RuntimeError si la clé est invalide ou si l'import manque.
+
+    Compromis sécurité / performance (base locale mono-utilisateur) :
+    - cipher_memory_security=False : SQLCipher ne verrouille/efface plus chaque allocation,
+      gros gain en écriture, mais des pages en clair peuvent rester en mémoire libérée.
+    - kdf_iter : nombre d'itérations PBKDF2 ; doit correspondre à celui utilisé à la création
+      de la base (None = défaut SQLCipher, 256000 en v4), sinon la clé est rejetée.
+    - cipher_page_size : doit aussi correspondre à la création (4096 = défaut v4 et migration).
+    Passer None / True pour conserver les valeurs par défaut de SQLCipher.
     """
     sqlcipher = _get_sqlcipher_module()
     if sqlcipher is None:
@@ -31,10 +46,33 @@ def connect_sqlcipher(db_path: str, passphrase: str, timeout: float = 5.0) -> An
     conn = sqlcipher.connect(db_path, timeout=timeout)
     cur = conn.cursor()
     cur.execute(f"PRAGMA key = '{passphrase}';")
+    # réglages du chiffrement : avant tout accès aux pages
+    cipher_pragmas = []
+    if not cipher_memory_security:
+        cipher_pragmas.append("PRAGMA cipher_memory_security = OFF;")
+    if cipher_page_size:
+        cipher_pragmas.append(f"PRAGMA cipher_page_size = {int(cipher_page_size)};")
+    if kdf_iter:
+        cipher_pragmas.append(f"PRAGMA kdf_iter = {int(kdf_iter)};")
+    if cipher_pragmas:
+        cur.executescript("\n".join(cipher_pragmas))
     try:
-        cur.execute("SELECT count(*) FROM sqlite_master;")
+        # une seule page de schéma à déchiffrer ; échoue quand même si la clé est mauvaise
+        cur.execute("SELECT 1 FROM sqlite_master LIMIT 1;")
         _ = cur.fetchone()
     except Exception as e:
         conn.close()
         raise RuntimeError("Invalid SQLCipher key or corrupted DB") from e
+    # réglages d'exécution : clé validée
+    pragmas = []
+    if cache_size_kib:
+        pragmas.append(f"PRAGMA cache_size = -{int(cache_size_kib)};")
+    if journal_mode:
+        pragmas.append(f"PRAGMA journal_mode = {journal_mode};")
+    if synchronous:
+        pragmas.append(f"PRAGMA synchronous = {synchronous};")
+    if temp_store_memory:
+        pragmas.append("PRAGMA temp_store = MEMORY;")
+    if pragmas:
+        cur.executescript("\n".join(pragmas))
     return conn
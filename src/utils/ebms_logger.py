@@ -1,4 +1,4 @@
-from datetime import datetime
+import time
 
 LOG_FILE = "ebms_log.txt"
 
@@ -10,7 +10,7 @@ def log_verification_TIN(tin, status, message):
     - Statut (Valide, Invalide, Erreur HTTP, Erreur Réseau, etc.)
     - Message retourné par l’API OBR ou le système
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     ligne = f"[{timestamp}] TIN: {tin} | Statut: {status} | Message: {message}\n"
     try:
         with open(LOG_FILE, "a", encoding="utf-8") as f:
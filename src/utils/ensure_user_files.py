@@ -8,9 +8,12 @@ Prépare et sécurise les fichiers utilisateur au premier lancement.
 """
 
 import os
+import re
+import mmap
 import sys
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional
 
@@ -28,12 +31,7 @@ except Exception:
             return Path.home() / "Library" / "Application Support" / app_name
         return Path.home() / ".local" / "share" / app_name
 
-    def get_resource_path(relative: str) -> str:
-        try:
-            base = Path(sys._MEIPASS)  # type: ignore
-        except Exception:
-            base = Path(__file__).resolve().parent.parent
-        return str((base / relative).resolve())
+    from utils.resources import resource_path as get_resource_path  # type: ignore
 
     def get_default_db_path() -> str:
         return str((get_user_data_dir() / "facturation_obr.db").resolve())
@@ -52,6 +50,30 @@ except Exception:
     store_passphrase_keyring = None
     store_passphrase_local_encrypted = None
 
+MIGRATION_SENTINEL = ".obr_migrated"
+# mettre à 1 pour forcer la vérification complète (réparation) malgré la sentinelle
+_FORCE_CHECK_ENV = "HANKSTORE_FORCE_USER_FILES_CHECK"
+
+def _write_migration_sentinel(user_dir: Path):
+    try:
+        (Path(user_dir) / MIGRATION_SENTINEL).write_text("1")
+    except Exception:
+        logger.exception("Could not write migration sentinel in %s", user_dir)
+
+_SQLITE_PLAIN_HEADER = b"SQLite format 3\0"
+
+def _is_encrypted_db(path: Path) -> bool:
+    """
+    Vrai si `path` est une base non vide dont l'en-tête n'est pas celui d'une base SQLite
+    en clair (une base SQLCipher commence par des octets aléatoires : sel de chiffrement).
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(16)
+    except OSError:
+        return False
+    return len(head) == 16 and head != _SQLITE_PLAIN_HEADER
+
 def _chmod_restrict(path: Path):
     try:
         if os.name != "nt":
@@ -59,11 +81,91 @@ def _chmod_restrict(path: Path):
     except Exception:
         logger.exception("chmod failed for %s", path)
 
+_ACL_USER_RE = re.compile(r"[\w\\.\- ]+")
+
+def _apply_windows_acl_ctypes(path: Path, user: str) -> bool:
+    """
+    Équivalent de `icacls <path> /inheritance:r /grant:r <user>:(F)` via advapi32,
+    sans lancer de processus. Retourne True si l'ACL a été appliquée.
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class TRUSTEE_W(ctypes.Structure):
+        _fields_ = [
+            ("pMultipleTrustee", ctypes.c_void_p),
+            ("MultipleTrusteeOperation", ctypes.c_int),
+            ("TrusteeForm", ctypes.c_int),
+            ("TrusteeType", ctypes.c_int),
+            ("ptstrName", wintypes.LPWSTR),
+        ]
+
+    class EXPLICIT_ACCESS_W(ctypes.Structure):
+        _fields_ = [
+            ("grfAccessPermissions", wintypes.DWORD),
+            ("grfAccessMode", ctypes.c_int),
+            ("grfInheritance", wintypes.DWORD),
+            ("Trustee", TRUSTEE_W),
+        ]
+
+    GENERIC_ALL = 0x10000000
+    SET_ACCESS = 2
+    NO_INHERITANCE = 0
+    SE_FILE_OBJECT = 1
+    DACL_SECURITY_INFORMATION = 0x00000004
+    PROTECTED_DACL_SECURITY_INFORMATION = 0x80000000
+
+    advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    advapi32.BuildExplicitAccessWithNameW.argtypes = [
+        ctypes.POINTER(EXPLICIT_ACCESS_W), wintypes.LPWSTR, wintypes.DWORD, ctypes.c_int, wintypes.DWORD]
+    advapi32.BuildExplicitAccessWithNameW.restype = None
+    advapi32.SetEntriesInAclW.argtypes = [
+        wintypes.ULONG, ctypes.POINTER(EXPLICIT_ACCESS_W), ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p)]
+    advapi32.SetEntriesInAclW.restype = wintypes.DWORD
+    advapi32.SetNamedSecurityInfoW.argtypes = [
+        wintypes.LPWSTR, ctypes.c_int, wintypes.DWORD,
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+    advapi32.SetNamedSecurityInfoW.restype = wintypes.DWORD
+    kernel32.LocalFree.argtypes = [ctypes.c_void_p]
+    kernel32.LocalFree.restype = ctypes.c_void_p
+
+    # ea.Trustee.ptstrName pointe dans ce tampon : il doit vivre jusqu'après SetEntriesInAclW
+    name = ctypes.create_unicode_buffer(user)
+    ea = EXPLICIT_ACCESS_W()
+    advapi32.BuildExplicitAccessWithNameW(ctypes.byref(ea), name,
+                                          GENERIC_ALL, SET_ACCESS, NO_INHERITANCE)
+    new_acl = ctypes.c_void_p()
+    rc = advapi32.SetEntriesInAclW(1, ctypes.byref(ea), None, ctypes.byref(new_acl))
+    if rc != 0:
+        logger.warning("SetEntriesInAclW returned %s for %s", rc, path)
+        return False
+    try:
+        rc = advapi32.SetNamedSecurityInfoW(
+            str(path), SE_FILE_OBJECT,
+            DACL_SECURITY_INFORMATION | PROTECTED_DACL_SECURITY_INFORMATION,
+            None, None, new_acl, None)
+    finally:
+        kernel32.LocalFree(new_acl)
+    if rc != 0:
+        logger.warning("SetNamedSecurityInfoW returned %s for %s", rc, path)
+        return False
+    return True
+
 def _apply_windows_acl(path: Path, username: Optional[str] = None):
     if os.name != "nt":
         return
     try:
         user = username or os.getenv("USERNAME") or os.getlogin()
+        if not _ACL_USER_RE.fullmatch(user or ""):
+            logger.warning("Refusing ACL for suspicious user name %r", user)
+            return
+        try:
+            if _apply_windows_acl_ctypes(path, user):
+                return
+        except Exception:
+            logger.exception("ctypes ACL failed for %s, falling back to icacls", path)
         cmd = f'icacls "{path}" /inheritance:r /grant:r "{user}:(F)"'
         rc = os.system(cmd)
         if rc != 0:
@@ -71,13 +173,58 @@ def _apply_windows_acl(path: Path, username: Optional[str] = None):
     except Exception:
         logger.exception("Windows ACL failed for %s", path)
 
+_MMAP_COPY_THRESHOLD = 1 << 20
+
+def _fast_copy(src: str, dst: str):
+    """
+    Copie src -> dst en laissant le noyau faire le travail :
+    CopyFileExW sous Windows ; ailleurs copy_file_range (Linux), puis mmap pour
+    les gros fichiers, puis os.sendfile (repli shutil.copyfileobj).
+    """
+    if os.name == "nt":
+        import ctypes
+        ok = ctypes.windll.kernel32.CopyFileExW(ctypes.c_wchar_p(src), ctypes.c_wchar_p(dst),
+                                                None, None, None, 0)
+        if not ok:
+            raise OSError(ctypes.GetLastError(), "CopyFileExW failed", src)
+        return
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = size
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+                return
+            except OSError:
+                # ex: systèmes de fichiers différents sur vieux noyaux -> repli
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        if size > _MMAP_COPY_THRESHOLD:
+            with mmap.mmap(fsrc.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                fdst.write(mm)
+            return
+        if not hasattr(os, "sendfile"):
+            shutil.copyfileobj(fsrc, fdst)
+            return
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
 def _copy_embedded_if_missing(src: str, dest: Path) -> Path:
-    dest.parent.mkdir(parents=True, exist_ok=True)
     if dest.exists():
         return dest
+    dest.parent.mkdir(parents=True, exist_ok=True)
     try:
         if os.path.exists(src):
-            shutil.copy2(src, str(dest))
+            _fast_copy(src, str(dest))
             logger.info("Copied embedded %s -> %s", src, dest)
             _chmod_restrict(dest)
             if os.name == "nt":
@@ -93,6 +240,23 @@ def _copy_embedded_if_missing(src: str, dest: Path) -> Path:
         logger.exception("Fallback create failed for %s", dest)
         return dest
 
+def _copy_env_if_missing(src: str, dest: Path) -> Path:
+    if dest.exists():
+        return dest
+    if os.path.exists(src):
+        try:
+            _fast_copy(src, str(dest))
+            _chmod_restrict(dest)
+        except Exception:
+            logger.exception("Could not copy env example")
+    else:
+        try:
+            dest.touch(exist_ok=True)
+            _chmod_restrict(dest)
+        except Exception:
+            logger.exception("Could not create env file")
+    return dest
+
 def ensure_user_files(app_name: str = "hankstoremanager", 
                       db_name: str = "facturation_obr.db",
                       inv_name: str = "app.inv",
@@ -110,49 +274,40 @@ def ensure_user_files(app_name: str = "hankstoremanager",
 
     results: Dict[str, str] = {}
 
-    # 1) copy plain DB (starting point)
-    try:
-        bundled_db = get_resource_path(db_name)
-    except Exception:
-        bundled_db = db_name
-    target_plain = Path(user_dir) / db_name
-    _copy_embedded_if_missing(bundled_db, target_plain)
-    results[db_name] = str(target_plain)
+    # lancements suivants : migration déjà faite, rien à importer ni copier
+    # (sauf si la base ou le .env ont disparu depuis : on refait la vérification complète)
+    if (os.getenv(_FORCE_CHECK_ENV) != "1"
+            and (Path(user_dir) / MIGRATION_SENTINEL).exists()
+            and (Path(user_dir) / db_name).exists()
+            and (Path(user_dir) / ".env").exists()):
+        results[db_name] = str(Path(user_dir) / db_name)
+        results[inv_name] = str(Path(user_dir) / inv_name)
+        results[".env"] = str(Path(user_dir) / ".env")
+        return results
 
-    # 2) copy inv file (app.inv)
-    try:
-        bundled_inv = get_resource_path(inv_name)
-    except Exception:
-        bundled_inv = inv_name
+    # 1) plain DB (starting point), 2) app.inv, 3) .env.example -> .env
+    bundled_db = get_resource_path(db_name)
+    bundled_inv = get_resource_path(inv_name)
+    bundled_env_example = get_resource_path(env_example_name)
+    target_plain = Path(user_dir) / db_name
     target_inv = Path(user_dir) / inv_name
-    _copy_embedded_if_missing(bundled_inv, target_inv)
-    results[inv_name] = str(target_inv)
-
-    # 3) copy .env.example -> .env
-    try:
-        bundled_env_example = get_resource_path(env_example_name)
-    except Exception:
-        bundled_env_example = env_example_name
     target_env = Path(user_dir) / ".env"
-    if not target_env.exists():
-        if os.path.exists(bundled_env_example):
-            try:
-                shutil.copy2(bundled_env_example, str(target_env))
-                _chmod_restrict(target_env)
-                results[".env"] = str(target_env)
-            except Exception:
-                logger.exception("Could not copy env example")
-                results[".env"] = str(target_env)
-        else:
-            try:
-                target_env.touch(exist_ok=True)
-                _chmod_restrict(target_env)
-                results[".env"] = str(target_env)
-            except Exception:
-                logger.exception("Could not create env file")
-                results[".env"] = str(target_env)
-    else:
-        results[".env"] = str(target_env)
+
+    # destinations absentes seulement ; copies indépendantes => en parallèle
+    jobs = [(fn, src, dst) for fn, src, dst in (
+        (_copy_embedded_if_missing, bundled_db, target_plain),
+        (_copy_embedded_if_missing, bundled_inv, target_inv),
+        (_copy_env_if_missing, bundled_env_example, target_env),
+    ) if not dst.exists()]
+    if len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            list(pool.map(lambda job: job[0](job[1], job[2]), jobs))
+    elif jobs:
+        fn, src, dst = jobs[0]
+        fn(src, dst)
+    results[db_name] = str(target_plain)
+    results[inv_name] = str(target_inv)
+    results[".env"] = str(target_env)
 
     # 4) SQLCipher migration (if available)
     cipher_db = Path(user_dir) / db_name
@@ -173,10 +328,12 @@ def ensure_user_files(app_name: str = "hankstoremanager",
                 sqlcipher_available = False
 
         if migrate_plain_to_sqlcipher and sqlcipher_available:
-            # if cipher file already exists and non-empty, consider it migrated
-            if cipher_db.exists() and cipher_db.stat().st_size > 0:
+            # cipher_db == target_plain : seul l'en-tête distingue une base déjà chiffrée
+            # de la base en clair tout juste copiée
+            if _is_encrypted_db(cipher_db):
                 migrated = True
                 results[db_name] = str(cipher_db)
+                _write_migration_sentinel(user_dir)
             else:
                 # generate strong passphrase
                 import os, base64
@@ -186,6 +343,7 @@ def ensure_user_files(app_name: str = "hankstoremanager",
                 if ok:
                     migrated = True
                     results[db_name] = str(cipher_db)
+                    _write_migration_sentinel(user_dir)
                     # store passphrase: prefer keyring
                     stored = False
                     try:
@@ -6,8 +6,10 @@ Gestion du stockage sécurisé de la passphrase SQLCipher.
 """
 
 import os
+import time
+import functools
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,11 +28,44 @@ except Exception:
 APP_KEY_NAME = "facturation_obr_sqlcipher"
 LOCAL_ENC_FILENAME = "sqlcipher_pass.enc"
 
+# Cache mémoire de la passphrase déchiffrée : évite l'aller-retour keyring (IPC)
+# ou la relecture + déchiffrement Fernet à chaque appel.
+PASSPHRASE_CACHE_TTL = 300.0
+_cached_pass: Dict[tuple, Tuple[str, float]] = {}
+
+@functools.lru_cache(maxsize=4)
+def _fernet(key: bytes):
+    """Instance Fernet réutilisée par clé (évite de re-parser la clé à chaque appel)."""
+    return Fernet(key)
+
+def _write_private_bytes(path: Path, data: bytes):
+    """Écrit data dans path sans suivre de lien symbolique (O_NOFOLLOW si dispo)."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    flags |= getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+    fd = os.open(str(path), flags, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+
+def _cache_get(key: tuple) -> Optional[str]:
+    hit = _cached_pass.get(key)
+    if hit and time.monotonic() - hit[1] < PASSPHRASE_CACHE_TTL:
+        return hit[0]
+    _cached_pass.pop(key, None)
+    return None
+
+def _cache_put(key: tuple, passphrase: str):
+    _cached_pass[key] = (passphrase, time.monotonic())
+
+def invalidate_cached_passphrase():
+    """Oublie les passphrases mises en cache (à appeler à la déconnexion)."""
+    _cached_pass.clear()
+
 def store_passphrase_keyring(passphrase: str, app_name: str = APP_KEY_NAME) -> bool:
     if keyring is None:
         return False
     try:
         keyring.set_password(app_name, "sqlcipher_pass", passphrase)
+        _cache_put(("keyring", app_name), passphrase)
         return True
     except Exception:
         logger.exception("keyring.set_password failed")
@@ -39,8 +74,14 @@ def store_passphrase_keyring(passphrase: str, app_name: str = APP_KEY_NAME) -> b
 def retrieve_passphrase_keyring(app_name: str = APP_KEY_NAME) -> Optional[str]:
     if keyring is None:
         return None
+    cached = _cache_get(("keyring", app_name))
+    if cached is not None:
+        return cached
     try:
-        return keyring.get_password(app_name, "sqlcipher_pass")
+        p = keyring.get_password(app_name, "sqlcipher_pass")
+        if p:
+            _cache_put(("keyring", app_name), p)
+        return p
     except Exception:
         logger.exception("keyring.get_password failed")
         return None
@@ -53,10 +94,10 @@ def store_passphrase_local_encrypted(passphrase: str, fernet_key: Optional[bytes
         if not fernet_key:
             logger.error("FERNET key absent, impossible de chiffrer localement")
             return False
-        f = Fernet(fernet_key)
-        token = f.encrypt(passphrase.encode("utf-8"))
+        token = _fernet(fernet_key).encrypt(passphrase.encode("utf-8"))
         out = Path(user_dir) / LOCAL_ENC_FILENAME
-        out.write_bytes(token)
+        _write_private_bytes(out, token)
+        _cache_put(("local", fernet_key, str(user_dir)), passphrase)
         try:
             if os.name != "nt":
                 out.chmod(0o600)
@@ -73,14 +114,17 @@ def retrieve_passphrase_local_encrypted(fernet_key: Optional[bytes], user_dir: s
             return None
         if not fernet_key:
             return None
+        cached = _cache_get(("local", fernet_key, str(user_dir)))
+        if cached is not None:
+            return cached
         p = Path(user_dir) / LOCAL_ENC_FILENAME
         if not p.exists():
             return None
         token = p.read_bytes()
-        f = Fernet(fernet_key)
         try:
-            dec = f.decrypt(token)
-            return dec.decode("utf-8")
+            dec = _fernet(fernet_key).decrypt(token).decode("utf-8")
+            _cache_put(("local", fernet_key, str(user_dir)), dec)
+            return dec
         except InvalidToken:
             logger.exception("Fernet decrypt failed: invalid token")
             return None
@@ -1,12 +1,31 @@
-import sqlite3
-import os
+import re
+import time
 import logging
 from datetime import datetime
-from database.connection import get_connection
+from database.connection import get_connection, get_db_path
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
+# Colonnes réellement consommées par les formulaires de facturation
+_CLIENT_COLS = (
+    "id, customer_name, customer_TIN, customer_address, customer_phone_number, "
+    "customer_postal_number, customer_email, customer_type, customer_sector, vat_customer_payer"
+)
+_CONTRIBUABLE_COLS = (
+    "id, tp_type, tp_name, tp_TIN, tp_trade_number, tp_postal_number, tp_phone_number, "
+    "tp_address_province, tp_address_commune, tp_address_quartier, tp_address_avenue, "
+    "tp_address_rue, tp_address_number, tp_fiscal_center, tp_legal_form, tp_activity_sector, "
+    "vat_taxpayer, ct_taxpayer, tl_taxpayer"
+)
+
+# Préfixe "{prefix}_{YYYYMMDD}_" du jour, recalculé seulement au changement de jour
+_today_cache = {"day": None, "prefix": None, "base": None}
+_SIGNATURE_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+
+# Les connexions de get_connection() utilisent row_factory = sqlite3.Row :
+# dict(row) suffit, aucune reconstruction via cur.description n'est nécessaire.
+
 def get_client_data(tin: str):
     if not tin:
         return None
@@ -14,21 +33,12 @@ def get_client_data(tin: str):
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cur.execute("SELECT * FROM client WHERE customer_TIN = ? LIMIT 1", (tin,))
+        cur.execute(f"SELECT {_CLIENT_COLS} FROM client WHERE customer_TIN = ? LIMIT 1", (tin,))
         row = cur.fetchone()
         if not row:
-            cur.execute("SELECT * FROM client WHERE customer_name LIKE ? LIMIT 1", (f"%{tin}%",))
+            cur.execute(f"SELECT {_CLIENT_COLS} FROM client WHERE customer_name LIKE ? LIMIT 1", (f"%{tin}%",))
             row = cur.fetchone()
-        if row is None:
-            return None
-        if isinstance(row, sqlite3.Row):
-            return dict(row)
-        if isinstance(row, dict):
-            return row
-        desc = [d[0] for d in cur.description] if cur.description else []
-        if desc and isinstance(row, (list, tuple)):
-            return {desc[i]: row[i] for i in range(min(len(desc), len(row)))}
-        return dict(row)
+        return dict(row) if row else None
     except Exception:
         logger.exception("Erreur get_client_data")
         return None
@@ -45,18 +55,9 @@ def get_contribuable_data(contribuable_id: int):
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cur.execute("SELECT * FROM contribuable WHERE id = ? LIMIT 1", (contribuable_id,))
+        cur.execute(f"SELECT {_CONTRIBUABLE_COLS} FROM contribuable WHERE id = ? LIMIT 1", (contribuable_id,))
         row = cur.fetchone()
-        if row is None:
-            return None
-        if isinstance(row, sqlite3.Row):
-            return dict(row)
-        if isinstance(row, dict):
-            return row
-        desc = [d[0] for d in cur.description] if cur.description else []
-        if desc and isinstance(row, (list, tuple)):
-            return {desc[i]: row[i] for i in range(min(len(desc), len(row)))}
-        return dict(row)
+        return dict(row) if row else None
     except Exception:
         logger.exception("Erreur get_contribuable_data")
         return None
@@ -72,8 +73,12 @@ def get_next_invoice_number(prefix: str = "INV", width: int = 4) -> str:
     Format retourné : {prefix}_{YYYYMMDD}_{suffix} où suffix est zero-padded à `width` chiffres.
     Utilise une transaction SQLite (BEGIN IMMEDIATE) pour réduire les collisions concurrentes.
     """
-    today = datetime.now().strftime("%Y%m%d")
-    base = f"{prefix}_{today}_"
+    today = time.strftime("%Y%m%d")
+    if _today_cache["day"] == today and _today_cache["prefix"] == prefix:
+        base = _today_cache["base"]
+    else:
+        base = f"{prefix}_{today}_"
+        _today_cache.update(day=today, prefix=prefix, base=base)
     conn = None
     try:
         conn = get_connection()
@@ -85,47 +90,18 @@ def get_next_invoice_number(prefix: str = "INV", width: int = 4) -> str:
             # si le moteur/connexion ne supporte pas BEGIN IMMEDIATE, continuer sans verrou explicite
             pass
 
-        # Tenter d'extraire le suffix numérique maximal directement en SQL
-        try:
-            cur.execute(
-                """
-                SELECT invoice_number,
-                       CAST(
-                         (   -- extraire la partie après le dernier underscore et caster en entier
-                           SUBSTR(invoice_number, INSTR(invoice_number, '_', -1) + 1)
-                         ) AS INTEGER
-                       ) AS suffix_num
-                FROM facture
-                WHERE invoice_number LIKE ?
-                ORDER BY suffix_num DESC
-                LIMIT 1
-                """,
-                (base + "%",)
-            )
-            row = cur.fetchone()
-        except Exception:
-            # fallback général si la requête SQL spécifique échoue (ex: dialecte sqlite sans INSTR(..., -1))
-            cur.execute("SELECT invoice_number FROM facture WHERE invoice_number LIKE ? ORDER BY id DESC LIMIT 1", (base + "%",))
-            row = cur.fetchone()
-
-        if row:
-            # row peut être sqlite3.Row ou tuple
-            last_inv = None
-            try:
-                last_inv = row["invoice_number"] if hasattr(row, "keys") else row[0]
-            except Exception:
-                last_inv = None
-            if last_inv:
-                # extraire le suffix numérique en Python de façon robuste
-                try:
-                    suffix_part = last_inv.rsplit("_", 1)[-1]
-                    num = int(suffix_part)
-                except Exception:
-                    num = 1
-            else:
-                num = 1
-        else:
-            num = 1
+        # Extraire le suffix numérique maximal du jour en une seule passe (pas de tri).
+        # INSTR() de SQLite n'accepte pas de position négative : on découpe après le préfixe connu.
+        cur.execute(
+            """
+            SELECT COALESCE(MAX(CAST(SUBSTR(invoice_number, ?) AS INTEGER)), 0)
+            FROM facture
+            WHERE invoice_number LIKE ?
+            """,
+            (len(base) + 1, base + "%")
+        )
+        row = cur.fetchone()
+        num = int(row[0] or 0) if row else 0
 
         next_num = num + 1
         suffix = str(next_num).zfill(width)
@@ -149,33 +125,43 @@ def get_next_invoice_number(prefix: str = "INV", width: int = 4) -> str:
         except Exception:
             pass
 
+# chemins des bases déjà vérifiées (la base active peut changer en cours de processus)
+_SIG_COLS_VERIFIED = set()
+
 def ensure_invoice_signature_columns():
+    db_path = get_db_path()
+    if db_path in _SIG_COLS_VERIFIED:
+        return
     conn = None
     try:
         conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(facture)")
-        rows = cur.fetchall()
-        cols = []
-        for r in rows:
-            try:
-                if isinstance(r, sqlite3.Row) or hasattr(r, "keys"):
-                    cols.append(r["name"] if "name" in r.keys() else r[1])
-                else:
-                    cols.append(r[1])
-            except Exception:
-                try:
-                    cols.append(r[1])
-                except Exception:
-                    pass
-        if "invoice_signature" not in cols:
-            cur.execute("ALTER TABLE facture ADD COLUMN invoice_signature TEXT")
-        if "invoice_signature_date" not in cols:
-            cur.execute("ALTER TABLE facture ADD COLUMN invoice_signature_date TEXT")
-        conn.commit()
+        # le mode sqlite3 hérité n'ouvre pas de transaction avant un DDL : BEGIN explicite,
+        # pour que les ALTER éventuels + l'index soient validés (ou annulés) ensemble
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(facture)")}
+            if "invoice_signature" not in cols:
+                conn.execute("ALTER TABLE facture ADD COLUMN invoice_signature TEXT")
+            if "invoice_signature_date" not in cols:
+                conn.execute("ALTER TABLE facture ADD COLUMN invoice_signature_date TEXT")
+            # index pour la recherche par préfixe dans get_next_invoice_number : invoice_number
+            # est TEXT UNIQUE (sqlite_autoindex_facture_1) ; on ne crée le nôtre que s'il manque,
+            # et on retire le doublon laissé par les versions précédentes
+            covering = []
+            for idx in conn.execute("PRAGMA index_list(facture)").fetchall():
+                idx_cols = [r[2] for r in conn.execute(f"PRAGMA index_info(\"{idx[1]}\")").fetchall()]
+                if idx_cols[:1] == ["invoice_number"]:
+                    covering.append(idx[1])
+            if not covering:
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_facture_invoice_number ON facture(invoice_number)")
+            elif "idx_facture_invoice_number" in covering and len(covering) > 1:
+                conn.execute("DROP INDEX IF EXISTS idx_facture_invoice_number")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _SIG_COLS_VERIFIED.add(db_path)
     except Exception:
-        try: conn.rollback()
-        except Exception: pass
         logger.exception("Erreur ensure_invoice_signature_columns")
     finally:
         try:
@@ -184,7 +170,7 @@ def ensure_invoice_signature_columns():
             pass
 
 def validate_signature_date(date_str: str) -> bool:
-    if not date_str:
+    if not date_str or not _SIGNATURE_DATE_RE.match(date_str):
         return False
     try:
         datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
@@ -1,14 +1,18 @@
-# utils/resources.py
 import os, sys
+from functools import lru_cache
+from pathlib import Path
 
+# Base calculée une seule fois : _MEIPASS (PyInstaller) ou dossier src/
+if getattr(sys, "frozen", False):
+    _BASE = Path(sys._MEIPASS)
+else:
+    _BASE = Path(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+@lru_cache(maxsize=256)
 def resource_path(rel_path: str) -> str:
     """
     Renvoie le chemin absolu vers une ressource.
     Fonctionne en dev et quand l'app est packagée par PyInstaller.
     Usage: resource_path('assets/logo.png') ou resource_path('facturation_obr.db')
     """
-    if getattr(sys, "frozen", False):
-        base = sys._MEIPASS
-    else:
-        base = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-    return os.path.join(base, rel_path)
+    return str(_BASE / rel_path)
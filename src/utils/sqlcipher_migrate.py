@@ -34,14 +34,26 @@ def migrate_plain_to_sqlcipher(plain_db: str, cipher_db: str, passphrase: str) -
     plain = str(Path(plain_db).resolve())
     cipher = str(Path(cipher_db).resolve())
 
+    # journal en mémoire seulement pour un fichier cible neuf : rien à préserver en cas d'échec
+    fresh_target = not Path(cipher).exists() or Path(cipher).stat().st_size == 0
+
     try:
         conn = sqlcipher.connect(cipher)
+        # contrôle explicite des transactions (pas de COMMIT implicite avant les DDL)
+        conn.isolation_level = None
         cur = conn.cursor()
         # Set key for the new encrypted DB
         cur.execute(f"PRAGMA key = '{passphrase}';")
-        conn.commit()
+        # Réglages pour une copie one-shot : une seule transaction, cache large ;
+        # synchronous FULL garde le fsync du COMMIT (la base est ensuite marquée migrée)
+        cur.execute("PRAGMA cipher_page_size = 4096;")
+        if fresh_target:
+            cur.execute("PRAGMA journal_mode = MEMORY;")
+        cur.execute("PRAGMA synchronous = FULL;")
+        cur.execute("PRAGMA temp_store = MEMORY;")
+        cur.execute("PRAGMA cache_size = -65536;")
 
-        # Attach the plain DB and copy objects
+        # Attach the plain DB and copy objects (ATTACH interdit dans une transaction)
         cur.execute(f"ATTACH DATABASE '{plain}' AS plain KEY '';")
         cur.execute(
             "SELECT type, name, sql FROM plain.sqlite_master "
@@ -49,6 +61,8 @@ def migrate_plain_to_sqlcipher(plain_db: str, cipher_db: str, passphrase: str) -
             "ORDER BY type='table' DESC"
         )
         rows = cur.fetchall()
+        # une seule transaction => un seul fsync à la fin
+        cur.execute("BEGIN")
         for typ, name, sql in rows:
             if not name or name.startswith("sqlite_"):
                 continue
@@ -62,7 +76,7 @@ def migrate_plain_to_sqlcipher(plain_db: str, cipher_db: str, passphrase: str) -
                     cur.execute(f"INSERT INTO \"{name}\" SELECT * FROM plain.\"{name}\";")
                 except Exception:
                     logger.exception("Could not copy data for table %s", name)
-        conn.commit()
+        cur.execute("COMMIT")
         cur.execute("DETACH DATABASE plain;")
         conn.close()
         logger.info("Migration to SQLCipher succeeded: %s", cipher)
@@ -116,7 +116,8 @@ def charger_image(filename: str, size: tuple = None, circle: bool = False):
                 return None
 
     # If called from a background thread, schedule creation on main thread and wait briefly.
-    result = {"photo": None, "done": False}
+    done = threading.Event()
+    result = {"photo": None}
     def _make():
         try:
             with _lock:
@@ -124,7 +125,7 @@ def charger_image(filename: str, size: tuple = None, circle: bool = False):
         except Exception:
             result["photo"] = None
         finally:
-            result["done"] = True
+            done.set()
 
     # Try to use default root; if not available, fail gracefully.
     try:
@@ -133,12 +134,7 @@ def charger_image(filename: str, size: tuple = None, circle: bool = False):
             return None
         root.after(0, _make)
         # wait for short time for creation (non-blocking design recommended instead)
-        waited = 0.0
-        while not result["done"] and waited < 1.5:
-            time_sleep = 0.02
-            import time
-            time.sleep(time_sleep)
-            waited += time_sleep
+        done.wait(1.5)
         return result["photo"]
     except Exception:
         return None
@@ -1,9 +1,14 @@
 # window_obr_license.py
 import sys
 import os
+import re
+import logging
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 # Assurez-vous que ces chemins sont corrects dans votre projet
 try:
@@ -27,8 +32,7 @@ except Exception:
 try:
     from models.key_manager_sqlite import (
         init_db,
-        consume_encrypted_input,
-        decrypt_key,
+        consume_encrypted_input_checked,
         consume_key_plain,
     )
 except Exception:
@@ -36,20 +40,40 @@ except Exception:
     def init_db(path: Optional[str] = None):
         pass
 
-    def consume_encrypted_input(token: str, used_by: Optional[str] = None, path: Optional[str] = None) -> bool:
-        return False
-
-    def decrypt_key(token: str) -> Optional[str]:
-        return None
+    def consume_encrypted_input_checked(token: str, used_by: Optional[str] = None,
+                                        path: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        return False, None
 
     def consume_key_plain(key: str, used_by: Optional[str] = None, path: Optional[str] = None) -> bool:
         return False
 
-# Initialiser la DB si nécessaire
+# Session courante (audit de l'activation), importée une seule fois
 try:
-    init_db()
+    from models.session import session as _session
 except Exception:
-    pass
+    _session = None
+
+# Initialisation de la DB différée au premier usage (pas d'accès disque à l'import)
+_db_ready = False
+
+def _ensure_db():
+    global _db_ready
+    if _db_ready:
+        return
+    try:
+        init_db()
+        _db_ready = True
+    except Exception:
+        pass
+
+# Normalisation de saisie en une passe C : suppression des espaces + majuscules ASCII
+_NORM_TABLE = str.maketrans({" ": None, **{c: c.upper() for c in "abcdefghijklmnopqrstuvwxyz"}})
+
+# Pré-contrôle bon marché d'un token Fernet (base64 urlsafe, >= 100 caractères)
+_FERNET_CHARS_RE = re.compile(r"^[A-Za-z0-9_\-=]+$")
+
+def _looks_like_fernet(s: str) -> bool:
+    return len(s) >= 100 and len(s) % 4 in (0, 2, 3) and bool(_FERNET_CHARS_RE.match(s))
 
 # Coordonnées de contact
 _SUPPORT_WHATSAPP = "+257 61 366 672"
@@ -70,21 +94,44 @@ class LicenseView(tk.Frame):
     ACTIVATION_GROUPS = 4  # ex: 4 groupes
     ACTIVATION_GROUP_LEN = 5  # ex: 5 caractères par groupe
 
+    # Animation de succès : nombre d'étapes et délai (ms) entre deux étapes
+    _ANIM_STEPS = 20
+    _ANIM_DELAY = 45
+
+    # Dérivés du format (calculés une fois par classe, cf. _init_activation_format)
+    _PREFIX_WITH_DASH = ""
+    _MAX_ACTIVATION_LEN = 0
+    _KEY_RE = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._init_activation_format()
+
+    @classmethod
+    def _init_activation_format(cls):
+        groups = max(1, int(cls.ACTIVATION_GROUPS))
+        glen = max(1, int(cls.ACTIVATION_GROUP_LEN))
+        prefix = (cls.ACTIVATION_PREFIX or "").strip().upper()
+        cls._PREFIX_WITH_DASH = f"{prefix}-" if prefix else ""
+        # longueur max d'une clé lisible (tirets et préfixe compris)
+        cls._MAX_ACTIVATION_LEN = groups * glen + (groups - 1) + len(cls._PREFIX_WITH_DASH)
+        # motif exact d'une clé lisible, ex: ^KEY-[A-Z0-9]{5}(-[A-Z0-9]{5}){3}$
+        cls._KEY_RE = re.compile(
+            rf"^{re.escape(cls._PREFIX_WITH_DASH)}[A-Z0-9]{{{glen}}}(-[A-Z0-9]{{{glen}}}){{{groups - 1}}}$"
+        )
+
     def __init__(self, parent, controller, **kwargs):
         super().__init__(parent, bg="#f0f2f5")
         self.controller = controller
         self._success_anim_id = None
         self._anim_bar = None
+        self._anim_i = 0
+        self._anim_then = None
         self._entry_var = tk.StringVar(value="")
-
-        # calculer longueur max pour clé lisible (avec tirets et préfixe)
-        groups = max(1, int(self.ACTIVATION_GROUPS))
-        glen = max(1, int(self.ACTIVATION_GROUP_LEN))
-        hyphens = groups - 1 if groups > 1 else 0
-        base_len = groups * glen + hyphens
-        prefix = (self.ACTIVATION_PREFIX or "").strip()
-        prefix_len = (len(prefix) + 1) if prefix else 0  # +1 pour le '-'
-        self._max_activation_len = base_len + prefix_len
+        self._last_normalized = ""
+        # une seule activation à la fois, exécutée hors du thread Tk
+        self._activation_busy = False
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="license")
 
         self._build_ui()
 
@@ -109,7 +156,7 @@ class LicenseView(tk.Frame):
         self._status_label = tk.Label(card, text="", bg="white", fg="#333", font=("Segoe UI", 10))
         self._status_label.pack(pady=(0, 8))
 
-        btn = tk.Button(
+        self._btn_valider = btn = tk.Button(
             card,
             text="Valider",
             bg="#1e90ff",
@@ -122,7 +169,7 @@ class LicenseView(tk.Frame):
         self.entry.bind("<Return>", lambda e: self._on_valider())
 
         # Hint sur le format attendu
-        prefix = f"{self.ACTIVATION_PREFIX + '-'}" if self.ACTIVATION_PREFIX else ""
+        prefix = self._PREFIX_WITH_DASH
         hint_parts = ["X" * int(self.ACTIVATION_GROUP_LEN) for _ in range(int(self.ACTIVATION_GROUPS))]
         hint = f"Format attendu: {prefix}{'-'.join(hint_parts)}"
         tk.Label(card, text=hint, bg="white", fg="#666", font=("Segoe UI", 9)).pack(pady=(6, 0))
@@ -133,23 +180,27 @@ class LicenseView(tk.Frame):
         - supprime espaces
         - met en majuscule
         - si token Fernet probable (commence par GAAAA) : n'applique pas de troncature
-        - sinon tronque à self._max_activation_len
+        - sinon tronque à self._MAX_ACTIVATION_LEN
         """
         try:
             val = self._entry_var.get()
             if not isinstance(val, str):
                 return
-            normalized = val.replace(" ", "").upper()
+            # déclenché par notre propre set() : rien à refaire
+            if val == self._last_normalized:
+                return
+            normalized = val.translate(_NORM_TABLE)
 
             # If likely a Fernet token, allow long input
             if normalized.startswith("GAAAA"):
                 new = normalized
             else:
-                if len(normalized) > self._max_activation_len:
-                    new = normalized[: self._max_activation_len]
+                if len(normalized) > self._MAX_ACTIVATION_LEN:
+                    new = normalized[: self._MAX_ACTIVATION_LEN]
                 else:
                     new = normalized
 
+            self._last_normalized = new
             # set only if changed to avoid recursion
             if new != val:
                 # try to preserve cursor position by resetting value
@@ -158,56 +209,77 @@ class LicenseView(tk.Frame):
             pass
 
     def _on_valider(self):
+        # clic multiple / Entrée maintenue : ignoré tant qu'une activation est en cours
+        if self._activation_busy:
+            return
         raw = self._entry_var.get().strip()
         if not raw:
             messagebox.showerror("Erreur", "Veuillez saisir votre clé d'activation.")
             return
+        _ensure_db()
 
         # Normalize input
-        inp = raw.replace(" ", "").upper()
+        inp = raw.translate(_NORM_TABLE)
 
         # audit user (fallback)
-        try:
-            used_by = getattr(__import__("models.session", fromlist=["session"]).session, "username", "admin_Hosea_Ntaki")
-        except Exception:
-            used_by = "admin_Hosea_Ntaki"
-
-        ok = False
+        used_by = getattr(_session, "username", None) or "admin_Hosea_Ntaki"
 
         try:
             # Case 1: Fernet token (starts with gAAAA / GAAAA)
             if inp.startswith("GAAAA"):
-                # verify decryptable
-                plain = decrypt_key(inp)
-                if not plain:
+                # rejeter les collages manifestement invalides sans HMAC/base64
+                if not _looks_like_fernet(inp):
                     self._show_contact_error()
                     return
-                ok = consume_encrypted_input(inp, used_by=used_by)
+                # un seul déchiffrement : validation + consommation
+                job = (self._consume_fernet, inp, used_by)
 
             # Case 2: Plain activation key
             else:
-                prefix = (self.ACTIVATION_PREFIX or "").upper()
-                if prefix:
-                    if not inp.startswith(prefix + "-"):
-                        inp_prefixed = f"{prefix}-{inp}"
-                    else:
-                        inp_prefixed = inp
+                prefix = self._PREFIX_WITH_DASH
+                if prefix and not inp.startswith(prefix):
+                    inp_prefixed = prefix + inp
                 else:
                     inp_prefixed = inp
 
-                # Reject overly long plain keys
-                if len(inp_prefixed) > self._max_activation_len:
+                # format exact (longueur comprise) exigé avant d'interroger sqlite
+                if not self._KEY_RE.fullmatch(inp_prefixed):
                     self._show_contact_error()
                     return
 
-                ok = consume_key_plain(inp_prefixed, used_by=used_by)
+                job = (consume_key_plain, inp_prefixed, used_by)
 
-        except Exception as e:
-            # debug print; en prod utilise logging
-            try:
-                print(f"[LicenseView] erreur consommation clé: {e}")
-            except Exception:
-                pass
+            self._set_busy(True)
+            fut = self._exec.submit(job[0], job[1], used_by=job[2])
+        except Exception:
+            self._set_busy(False)
+            logger.exception("Erreur consommation clé")
+            self._show_contact_error()
+            return
+
+        self.after(30, self._poll_activation, fut)
+
+    @staticmethod
+    def _consume_fernet(token, used_by=None):
+        ok, plain = consume_encrypted_input_checked(token, used_by=used_by)
+        return bool(ok and plain)
+
+    def _set_busy(self, busy):
+        self._activation_busy = busy
+        try:
+            self._btn_valider.config(state="disabled" if busy else "normal")
+        except Exception:
+            pass
+
+    def _poll_activation(self, fut):
+        if not fut.done():
+            self.after(30, self._poll_activation, fut)
+            return
+        self._set_busy(False)
+        try:
+            ok = fut.result()
+        except Exception:
+            logger.exception("Erreur consommation clé")
             ok = False
 
         if ok:
@@ -244,30 +316,31 @@ class LicenseView(tk.Frame):
             except Exception:
                 self._anim_bar = None
 
-            steps = 20
-            delay = 45  # ms between steps
+            self._anim_i = 0
+            self._anim_then = then
+            self._anim_step()
+        except Exception:
+            if callable(then):
+                then()
 
-            def step(i=0):
+    def _anim_step(self):
+        then = self._anim_then
+        try:
+            if self._anim_bar:
+                self._anim_bar["value"] = self._anim_i * 100 // self._ANIM_STEPS
+            if self._anim_i < self._ANIM_STEPS:
+                self._anim_i += 1
+                self._success_anim_id = self.after(self._ANIM_DELAY, self._anim_step)
+                return
+            self._success_anim_id = None
+            if self._anim_bar:
                 try:
-                    val = int((i / steps) * 100)
-                    if self._anim_bar:
-                        self._anim_bar["value"] = val
-                    if i < steps:
-                        self._success_anim_id = self.after(delay, lambda: step(i + 1))
-                    else:
-                        if self._anim_bar:
-                            try:
-                                self._anim_bar.destroy()
-                            except Exception:
-                                pass
-                        self._status_label.config(text="Prêt", fg="#075e3b", font=("Segoe UI", 10, "bold"))
-                        if callable(then):
-                            then()
+                    self._anim_bar.destroy()
                 except Exception:
-                    if callable(then):
-                        then()
-
-            step(0)
+                    pass
+            self._status_label.config(text="Prêt", fg="#075e3b", font=("Segoe UI", 10, "bold"))
+            if callable(then):
+                then()
         except Exception:
             if callable(then):
                 then()
@@ -292,6 +365,10 @@ class LicenseView(tk.Frame):
                 pass
 
     def destroy(self):
+        try:
+            self._exec.shutdown(wait=False)
+        except Exception:
+            pass
         try:
             if self._success_anim_id:
                 self.after_cancel(self._success_anim_id)
@@ -303,3 +380,7 @@ class LicenseView(tk.Frame):
         except Exception:
             pass
         return super().destroy()
+
+
+# __init_subclass__ ne s'applique qu'aux sous-classes : la classe de base est initialisée ici
+LicenseView._init_activation_format()
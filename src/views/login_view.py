@@ -5,17 +5,15 @@ au lieu d'appels directs à sqlite3.connect(...).
 """
 
 import os
+import time
 import hashlib
-try:
-    import bcrypt
-    _HAS_BCRYPT = True
-except Exception:
-    bcrypt = None
-    _HAS_BCRYPT = False
-
+import hmac
+import threading
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
 
 from utils import util_ventana as utl
 from models.session import session as global_session
@@ -32,104 +30,183 @@ except Exception:
         conn.row_factory = sqlite3.Row
         return conn
 
+logger = logging.getLogger(__name__)
+
 # ----------------- Password helpers -----------------
 
+# bcrypt (et PIL plus bas) ne sont importés qu'au premier besoin :
+# le module de login se charge sans tirer ces bibliothèques natives.
+_bcrypt_mod = {}
+
+def _load_bcrypt():
+    """Retourne le module bcrypt (ou None s'il est absent), importé une seule fois."""
+    try:
+        return _bcrypt_mod["mod"]
+    except KeyError:
+        pass
+    try:
+        import bcrypt as mod
+    except Exception:
+        mod = None
+    _bcrypt_mod["mod"] = mod
+    return mod
+
+def _has_bcrypt() -> bool:
+    return _load_bcrypt() is not None
+
 def _hash_password(pw: str) -> str:
     if not pw:
         return ""
-    if _HAS_BCRYPT:
+    bcrypt = _load_bcrypt()
+    if bcrypt is not None:
         hashed = bcrypt.hashpw(pw.encode("utf-8"), bcrypt.gensalt())
         return hashed.decode("utf-8")
     else:
         return hashlib.sha256(pw.encode("utf-8")).hexdigest()
 
+# Cache des vérifications bcrypt : (sha256(mdp), hash stocké) -> (résultat, horodatage).
+# Évite de repayer le KDF bcrypt sur les reconnexions rapprochées.
+_VERIFY_CACHE_TTL = 300.0
+_VERIFY_CACHE_MAX = 256
+_verify_cache = {}
+
+def clear_verify_cache():
+    _verify_cache.clear()
+
+def _verify_cached(pw_bytes: bytes, sh: str) -> bool:
+    key = (hashlib.sha256(pw_bytes).digest(), sh)
+    hit = _verify_cache.get(key)
+    now = time.monotonic()
+    if hit and now - hit[1] < _VERIFY_CACHE_TTL:
+        return hit[0]
+    try:
+        ok = _load_bcrypt().checkpw(pw_bytes, sh.encode("utf-8"))
+    except Exception:
+        ok = False
+    if len(_verify_cache) >= _VERIFY_CACHE_MAX:
+        _verify_cache.clear()
+    _verify_cache[key] = (ok, now)
+    return ok
+
+_BCRYPT_PREFIXES = frozenset(("$2a$", "$2b$", "$2y$"))
+
+def _is_bcrypt(sh: str) -> bool:
+    return sh[:4] in _BCRYPT_PREFIXES
+
 def verify_password(plain_pw: str, stored_hash: str) -> bool:
     if not plain_pw or not stored_hash:
         return False
     sh = str(stored_hash).strip()
     if not sh:
         return False
-    if sh.startswith("$2a$") or sh.startswith("$2b$") or sh.startswith("$2y$"):
-        if not _HAS_BCRYPT:
-            return False
-        try:
-            return bcrypt.checkpw(plain_pw.encode("utf-8"), sh.encode("utf-8"))
-        except Exception:
+    pw_bytes = plain_pw.encode("utf-8")
+    if _is_bcrypt(sh):
+        if not _has_bcrypt():
             return False
+        return _verify_cached(pw_bytes, sh)
     else:
         try:
-            return hashlib.sha256(plain_pw.encode("utf-8")).hexdigest() == sh
+            # comparaison à temps constant, comme pour bcrypt
+            return hmac.compare_digest(hashlib.sha256(pw_bytes).hexdigest(), sh)
         except Exception:
             return False
 
 # ----------------- Authentication -----------------
 
-def verifier_utilisateur_local(username, password):
+User = namedtuple("User", ("username", "role"))
+
+_username_index_checked = False
+
+def _ensure_username_index(conn):
     """
-    Vérifie identifiants contre utilisateur_societe.username.
-    La colonne 'password' doit contenir le hash (bcrypt ou sha256 hex).
-    Retourne sqlite3.Row si ok, sinon None.
+    Garantit un index (unique) sur utilisateur_societe.username, une fois par processus.
+    Le schéma actuel le fournit déjà via UNIQUE ; on ne crée l'index que s'il manque.
+    """
+    global _username_index_checked
+    if _username_index_checked:
+        return
+    _username_index_checked = True
+    try:
+        has_index = False
+        for idx in conn.execute("PRAGMA index_list(utilisateur_societe)").fetchall():
+            cols = [r[2] for r in conn.execute(f"PRAGMA index_info(\"{idx[1]}\")").fetchall()]
+            if cols == ["username"]:
+                has_index = True
+                break
+        if not has_index:
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_username ON utilisateur_societe(username)")
+            conn.commit()
+        if logger.isEnabledFor(logging.DEBUG):
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT password, role FROM utilisateur_societe "
+                                "WHERE username = ? LIMIT 1", ("",)).fetchall()
+            logger.debug("Login query plan: %s", [tuple(r) for r in plan])
+    except Exception:
+        logger.exception("Could not ensure index on utilisateur_societe.username")
+
+def _migrate_to_bcrypt(username, password, old_hash):
+    """
+    Remplace un hash sha256 par un hash bcrypt (exécuté dans un thread de fond).
+    L'UPDATE est gardé par l'ancien hash : sans effet si le mot de passe a changé entre-temps.
     """
-    if not username or not password:
-        return None
     try:
+        new_hash = _hash_password(password)
         conn = get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM utilisateur_societe WHERE username = ? LIMIT 1", (username,))
-            user = cur.fetchone()
+            conn.execute("UPDATE utilisateur_societe SET password = ? WHERE username = ? AND password = ?",
+                         (new_hash, username, old_hash))
+            conn.commit()
         finally:
             try:
                 conn.close()
             except Exception:
                 pass
+    except Exception:
+        # ignore migration errors
+        pass
 
-        if not user:
+def verifier_utilisateur_local(username, password):
+    """
+    Vérifie identifiants contre utilisateur_societe.username.
+    La colonne 'password' doit contenir le hash (bcrypt ou sha256 hex).
+    Retourne User(username, role) si ok, sinon None.
+    Appelée depuis un thread de travail : les erreurs base sont propagées à l'appelant
+    (pas de messagebox ici).
+    """
+    if not username or not password:
+        return None
+    conn = None
+    try:
+        conn = get_connection()
+        _ensure_username_index(conn)
+        cur = conn.cursor()
+        cur.execute("SELECT password, role FROM utilisateur_societe WHERE username = ? LIMIT 1", (username,))
+        row = cur.fetchone()
+        if not row:
             return None
-
-        stored_hash = None
-        try:
-            stored_hash = user["password"]
-        except Exception:
-            # fallback to common positions
-            try:
-                if len(user) > 2:
-                    stored_hash = user[2]
-                elif len(user) > 3:
-                    stored_hash = user[3]
-            except Exception:
-                stored_hash = None
+        stored_hash, role = row[0], row[1]
 
         if verify_password(password, stored_hash):
-            # optional migration sha256->bcrypt: update stored hash if bcrypt available
-            try:
-                sh = str(stored_hash or "")
-                if _HAS_BCRYPT and not (sh.startswith("$2a$") or sh.startswith("$2b$") or sh.startswith("$2y$")):
-                    new_hash = _hash_password(password)
-                    try:
-                        conn2 = get_connection()
-                        try:
-                            cur2 = conn2.cursor()
-                            cur2.execute("UPDATE utilisateur_societe SET password = ? WHERE username = ?", (new_hash, username))
-                            conn2.commit()
-                        finally:
-                            try:
-                                conn2.close()
-                            except Exception:
-                                pass
-                    except Exception:
-                        # ignore migration errors
-                        pass
-            except Exception:
-                pass
-            return user
-        return None
-    except Exception as e:
-        messagebox.showerror("Erreur", f"Connexion à la base impossible : {e}")
+            # optional migration sha256->bcrypt, hors du thread Tk (bcrypt.hashpw est coûteux) ;
+            # le thread ouvre sa propre connexion (une connexion sqlite3 reste liée à son thread)
+            sh = str(stored_hash or "")
+            if _has_bcrypt() and not _is_bcrypt(sh):
+                threading.Thread(target=_migrate_to_bcrypt, args=(username, password, stored_hash), daemon=True).start()
+            return User(username, role)
         return None
+    except Exception:
+        logger.exception("verifier_utilisateur_local failed")
+        raise
+    finally:
+        try:
+            if conn: conn.close()
+        except Exception:
+            pass
 
 # ----------------- LoginView -----------------
 
+# (chemin, largeur, hauteur) -> ImageTk.PhotoImage du visuel de gauche
+_LOGIN_LOGO_CACHE = {}
+
 class LoginView(tk.Frame):
     WIDTH = 620
     HEIGHT = 440
@@ -139,8 +216,19 @@ class LoginView(tk.Frame):
     def __init__(self, parent, controller, **kwargs):
         super().__init__(parent, bg="#f0f2f5")
         self.controller = controller
+        # accès sqlite + bcrypt hors du thread Tk
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="login")
+        # une seule authentification à la fois (clics / Entrée répétés ignorés)
+        self._auth_in_flight = False
+        self._btn_conn = None
+        self.bind("<Destroy>", self._on_destroy, add="+")
         self._build_ui()
 
+    def _on_destroy(self, event=None):
+        if event is not None and event.widget is not self:
+            return
+        self._exec.shutdown(wait=False)
+
     def _build_ui(self):
         root = self.controller
         root.title("Connexion à la plateforme")
@@ -162,14 +250,19 @@ class LoginView(tk.Frame):
         COLOR_RIGHT_BG = "#ffffff"
         COLOR_PAGE_BG = "#f0f2f5"
 
-        logo = None
         assets_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "login.png")
-        try:
-            pil_img = Image.open(assets_path)
-            pil_img = pil_img.resize((self.LEFT_WIDTH, self.HEIGHT), Image.Resampling.LANCZOS)
-            logo = ImageTk.PhotoImage(pil_img)
-        except Exception:
-            logo = None
+        cache_key = (assets_path, self.LEFT_WIDTH, self.HEIGHT)
+        logo = _LOGIN_LOGO_CACHE.get(cache_key)
+        if logo is None:
+            try:
+                from PIL import Image, ImageTk
+                pil_img = Image.open(assets_path)
+                pil_img = pil_img.resize((self.LEFT_WIDTH, self.HEIGHT), Image.Resampling.LANCZOS)
+                logo = ImageTk.PhotoImage(pil_img)
+                # réutilisé au retour sur LoginView (déconnexion) : pas de nouveau LANCZOS
+                _LOGIN_LOGO_CACHE[cache_key] = logo
+            except Exception:
+                logo = None
 
         main_container = tk.Frame(self, bg=COLOR_PAGE_BG)
         main_container.pack(fill="both", expand=True)
@@ -242,20 +335,26 @@ class LoginView(tk.Frame):
         self.barre_chargement = ttk.Progressbar(cadre_champs, mode="indeterminate")
 
         def se_connecter():
+            if self._auth_in_flight:
+                return
             username = self.champ_utilisateur.get().strip()
             password = self.champ_mot_de_passe.get().strip()
             if not username or not password:
                 messagebox.showerror("Erreur", "Veuillez saisir vos identifiants.")
                 return
+            self._set_auth_busy(True)
             try:
-                self.barre_chargement.pack(fill="x", padx=6, pady=(6, 6))
-                self.barre_chargement.start()
-            except Exception:
-                pass
-            self.after(200, lambda: self._verifier_et_lancer(username, password))
+                fut = self._exec.submit(verifier_utilisateur_local, username, password)
+            except Exception as e:
+                self._set_auth_busy(False)
+                messagebox.showerror("Erreur", f"Connexion à la base impossible : {e}")
+                return
+            # La barre n'apparaît que si l'authentification dure plus de 100 ms
+            self.after(100, self._maybe_show_progress, fut)
+            self.after(30, self._poll_auth, fut, username)
 
-        btn_conn = tk.Button(cadre_champs, text="Se connecter", font=("Segoe UI", 13, "bold"),
-                             bg="#1e90ff", fg="white", bd=0, activebackground="#1673d6", command=se_connecter)
+        btn_conn = self._btn_conn = tk.Button(cadre_champs, text="Se connecter", font=("Segoe UI", 13, "bold"),
+                                              bg="#1e90ff", fg="white", bd=0, activebackground="#1673d6", command=se_connecter)
         btn_conn.pack(fill="x", padx=6, pady=(8, 10))
 
         self.champ_utilisateur.bind("<Return>", lambda e: se_connecter())
@@ -263,43 +362,73 @@ class LoginView(tk.Frame):
 
         try:
             root.attributes("-alpha", 0.0)
-            def fade_in():
-                try:
-                    a = root.attributes("-alpha")
-                except Exception:
-                    return
-                if a < 1.0:
-                    try:
-                        root.attributes("-alpha", min(1.0, a + 0.06))
-                    except Exception:
-                        pass
-                    root.after(18, fade_in)
             root.deiconify()
-            fade_in()
+            self._fade(0.0, 1.0)
         except Exception:
             root.deiconify()
 
-    def _verifier_et_lancer(self, username, password):
+    def _fade(self, start, end, then=None, steps=17, dt=18):
+        """
+        Fondu de la fenêtre : toutes les étapes sont planifiées d'un coup
+        (pas de relecture de -alpha), puis `then` après la dernière.
+        """
+        root = self.controller
+
+        def _set_alpha(v):
+            try:
+                root.attributes("-alpha", v)
+            except Exception:
+                pass
+
+        for i in range(steps + 1):
+            a = start + (end - start) * i / steps
+            root.after(i * dt, lambda v=a: _set_alpha(v))
+        if callable(then):
+            root.after(steps * dt, then)
+
+    def _set_auth_busy(self, busy):
+        # la touche Entrée passe aussi par se_connecter, donc par le drapeau
+        self._auth_in_flight = busy
+        try:
+            self._btn_conn.config(state="disabled" if busy else "normal")
+        except Exception:
+            pass
+
+    def _maybe_show_progress(self, fut):
+        if fut.done():
+            return
+        try:
+            self.barre_chargement.pack(fill="x", padx=6, pady=(6, 6))
+            self.barre_chargement.start()
+        except Exception:
+            pass
+
+    def _poll_auth(self, fut, username):
+        if not fut.done():
+            self.after(30, self._poll_auth, fut, username)
+            return
         try:
             self.barre_chargement.stop()
             self.barre_chargement.pack_forget()
         except Exception:
             pass
+        exc = fut.exception()
+        if exc is not None:
+            self._set_auth_busy(False)
+            messagebox.showerror("Erreur", f"Connexion à la base impossible : {exc}")
+            return
+        user = fut.result()
+        if not user:
+            self._set_auth_busy(False)
+        # en cas de succès le formulaire reste verrouillé jusqu'au changement de vue
+        self._verifier_et_lancer_finish(user, username)
 
-        user = verifier_utilisateur_local(username, password)
+    def _verifier_et_lancer_finish(self, user, username):
         if not user:
             messagebox.showerror("Erreur", "Identifiants incorrects ❌")
             return
 
-        # Extract role safely
-        role = None
-        try:
-            if "role" in user.keys():
-                role = user["role"]
-            elif len(user) >= 4:
-                role = user[3]
-        except Exception:
-            role = None
+        role = user.role
 
         # start session
         try:
@@ -319,40 +448,33 @@ class LoginView(tk.Frame):
                 self.controller.show_view("LicenseView")
             except Exception as e:
                 messagebox.showerror("Erreur", f"Impossible d'ouvrir LicenseView : {e}")
+            finally:
+                self._set_auth_busy(False)
             return
 
         # Normal users -> open MainView with fade out
         root = self.controller
 
-        def fade_out():
+        def _open_main():
             try:
-                alpha = root.attributes("-alpha")
-            except Exception:
-                alpha = 1.0
-            if alpha > 0.0:
+                self.controller.show_view("MainView", on_logout=self._on_logout)
+            except Exception as e:
+                messagebox.showerror("Erreur", f"Impossible d'ouvrir l'application principale : {e}")
+            finally:
+                self._set_auth_busy(False)
                 try:
-                    root.attributes("-alpha", max(0.0, alpha - 0.06))
+                    root.attributes("-alpha", 1.0)
                 except Exception:
                     pass
-                root.after(18, fade_out)
-            else:
-                try:
-                    self.controller.show_view("MainView", on_logout=self._on_logout)
-                except Exception as e:
-                    messagebox.showerror("Erreur", f"Impossible d'ouvrir l'application principale : {e}")
-                finally:
-                    try:
-                        root.attributes("-alpha", 1.0)
-                    except Exception:
-                        pass
 
-        fade_out()
+        self._fade(1.0, 0.0, then=_open_main)
 
     def _on_logout(self):
         try:
             global_session.end_session()
         except Exception:
             pass
+        clear_verify_cache()
         try:
             self.controller.show_view("LoginView")
         except Exception:
@@ -1,115 +1,361 @@
 # MainView.py
 import os
+import importlib
+import functools
+import itertools
+import contextlib
+import atexit
+import queue
 import threading
 import time
 import socket
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, font as tkfont
 import sqlite3
 import logging
+from types import MappingProxyType
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.util_images import charger_image
 from models.session import session as global_session
 from config import COULEUR_BARRE_SUPERIEURE, COULEUR_MENU_LATERAL, COULEUR_CORPS_PRINCIPAL, COULEUR_MENU_SURVOL
 
-from gui.liste_clients import afficher_liste_clients
-from gui.window_facture import afficher_formulaire_facture
-from gui.tableau_de_Factures import afficher_liste_factures
-from gui.tableau_articles_reuissi import show_obr_articles
-from gui.tableau_articles_echec import show_failed_articles
-from gui.window_articles_import import ImportStockBatchFrame
-from gui.tableau_articles_import_echec import FailedImportsFrame
-from gui.tableau_article_import_re import show_obr_articles_import
-from gui.tableau_utilisateurs import afficher_tableau_utilisateurs
-from gui.window_article_entre import formulaire_entree_et_declaration
-from gui.window_facture_saisie import afficher_formulaire_facture_manual
-from gui.window_utilisateurs import afficher_formulaire_utilisateur_societe
-
-from database.connection import get_connection
-from api.obr_client import obtenir_token_auto, get_system_id
-
-# optional dashboard modules
-try:
-    from gui.dashboard_manager import build_metrics_panel
-except Exception:
-    build_metrics_panel = None
-
-try:
-    from gui.dashboard_agent import build_dashboard_overview
-except Exception:
-    build_dashboard_overview = None
-
-try:
-    from gui.form_graficas_design import FormulaireGraphiquesDesign
-except Exception:
-    FormulaireGraphiquesDesign = None
-
-# optional theme helpers
-try:
-    from gui.theme import apply_tk_theme, apply_matplotlib_theme
-except Exception:
-    apply_tk_theme = None
-    apply_matplotlib_theme = None
+from database.connection import get_connection, get_db_path
+
+# Modules gui.* importés au premier usage seulement (PEP 562) :
+# un agent n'ouvre qu'une fraction des écrans, inutile de tous les charger au démarrage.
+_lazy_imports = {
+    "afficher_liste_clients": ("gui.liste_clients", "afficher_liste_clients"),
+    "afficher_formulaire_facture": ("gui.window_facture", "afficher_formulaire_facture"),
+    "afficher_liste_factures": ("gui.tableau_de_Factures", "afficher_liste_factures"),
+    "show_obr_articles": ("gui.tableau_articles_reuissi", "show_obr_articles"),
+    "show_failed_articles": ("gui.tableau_articles_echec", "show_failed_articles"),
+    "ImportStockBatchFrame": ("gui.window_articles_import", "ImportStockBatchFrame"),
+    "FailedImportsFrame": ("gui.tableau_articles_import_echec", "FailedImportsFrame"),
+    "show_obr_articles_import": ("gui.tableau_article_import_re", "show_obr_articles_import"),
+    "afficher_tableau_utilisateurs": ("gui.tableau_utilisateurs", "afficher_tableau_utilisateurs"),
+    "formulaire_entree_et_declaration": ("gui.window_article_entre", "formulaire_entree_et_declaration"),
+    "afficher_formulaire_facture_manual": ("gui.window_facture_saisie", "afficher_formulaire_facture_manual"),
+    "afficher_formulaire_utilisateur_societe": ("gui.window_utilisateurs", "afficher_formulaire_utilisateur_societe"),
+    "obtenir_token_auto": ("api.obr_client", "obtenir_token_auto"),
+    "get_system_id": ("api.obr_client", "get_system_id"),
+    "invalidate_cached_passphrase": ("utils.key_store", "invalidate_cached_passphrase"),
+    # optional dashboard modules
+    "build_metrics_panel": ("gui.dashboard_manager", "build_metrics_panel"),
+    "build_dashboard_overview": ("gui.dashboard_agent", "build_dashboard_overview"),
+    "FormulaireGraphiquesDesign": ("gui.form_graficas_design", "FormulaireGraphiquesDesign"),
+    # optional theme helpers
+    "apply_tk_theme": ("gui.theme", "apply_tk_theme"),
+    "apply_matplotlib_theme": ("gui.theme", "apply_matplotlib_theme"),
+}
+
+# Modules facultatifs : None s'ils sont absents (comme les anciens try/except d'import)
+_OPTIONAL_IMPORTS = frozenset((
+    "build_metrics_panel", "build_dashboard_overview", "FormulaireGraphiquesDesign",
+    "apply_tk_theme", "apply_matplotlib_theme",
+))
+
+
+def __getattr__(name):
+    try:
+        mod_name, attr = _lazy_imports[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    try:
+        val = getattr(importlib.import_module(mod_name), attr)
+    except Exception:
+        if name not in _OPTIONAL_IMPORTS:
+            raise
+        val = None
+    globals()[name] = val
+    return val
+
+
+def _lazy(name):
+    """Résout un nom du registre depuis ce module (les globales nues ne passent pas par __getattr__)."""
+    try:
+        return globals()[name]
+    except KeyError:
+        return __getattr__(name)
+
+
+# icône de fenêtre : chemin et présence évalués une fois à l'import
+_ICO_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "assets", "app.ico"))
+_ICO_EXISTS = os.path.exists(_ICO_PATH)
 
 COULEUR_SCROLLBAR_FOND = COULEUR_MENU_LATERAL
 COULEUR_SCROLLBAR_BOUTON = "#5c7c98"
 COULEUR_SCROLLBAR_ACTIF = "#8ca3ba"
 
 logger = logging.getLogger(__name__)
+
+# résolu une fois : les except étroits n'ont plus de lookup d'attribut sur le module tk
+_TclError = tk.TclError
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 
+# Menus latéraux : (titre, icône, ((libellé, écran, permission), ...)).
+# L'écran est un nom du registre _lazy_imports, ou une méthode de MainView s'il commence par "_".
+_MENU_SPEC = (
+    ("Clients", "👥", (
+        ("Lister les clients", "afficher_liste_clients", "clients_view"),
+    )),
+    ("Factures", "📄", (
+        ("Lister les factures", "afficher_liste_factures", "factures_view"),
+        ("Créer une facture avec stock ", "afficher_formulaire_facture", "factures_declare_create"),
+        ("Créer une facture sans stock ", "afficher_formulaire_facture_manual", "factures_nondeclare_create"),
+    )),
+    ("Articles", "📦", (
+        ("Articles déclarés réuissis", "show_obr_articles", "articles_reuissi_view"),
+        ("Articles déclarés non réuissis", "show_failed_articles", "articles_echec_view"),
+        ("Entrée & déclaration", "formulaire_entree_et_declaration", "articles_create"),
+    )),
+    ("Articles Importés", "📥", (
+        ("Articles Importes déclarés réuissis", "show_obr_articles_import", "articles_create"),
+        ("Articles Importes déclarés echec", "FailedImportsFrame", "articles_create"),
+        ("Déclarés Articles Importes", "_open_import_batch", "articles_import_create"),
+    )),
+    ("Utilisateurs", "👤", (
+        ("Lister les utilisateurs", "afficher_tableau_utilisateurs", "utilisateurs_view"),
+        ("Créer un utilisateur", "afficher_formulaire_utilisateur_societe", "utilisateurs_create"),
+    )),
+)
+
+# Bouton de tableau de bord affiché selon le rôle (sans rôle : agent)
+_ROLE_DASH = {
+    "admin": "🏛️ Dashboard Admin",
+    "manager": "🏢 Dashboard Manager",
+    "agent": "👷 Dashboard Agent",
+}
+
+# seules ces vues (dashboards, graphiques) sont gardées construites entre deux navigations :
+# les formulaires et listes sont reconstruits à chaque ouverture (numéros, données à jour)
+_CACHEABLE_VIEWS = frozenset({"graphiques"} | {f"dash_{role}" for role in _ROLE_DASH})
+
+# écrans qui écrivent en base : les ouvrir invalide les vues en cache (chiffres périmés)
+_WRITING_SCREENS = frozenset(name for _, _, items in _MENU_SPEC for _, name, perm in items
+                             if perm and perm.endswith("_create"))
+
+# Permissions par rôle, dérivées une fois pour toutes des menus (lecture seule)
+_ALL_PERMS = frozenset(perm for _, _, items in _MENU_SPEC for _, _, perm in items if perm)
+_ROLE_PERMS = MappingProxyType({
+    "admin": _ALL_PERMS,
+    "manager": _ALL_PERMS,
+    "agent": frozenset(p for p in _ALL_PERMS if p.startswith(("clients_", "factures_")) or p == "dashboard"),
+})
+
+
+class _ConnPool:
+    """
+    Petit pool de connexions sqlite pour les lectures ponctuelles de la vue principale :
+    évite l'ouverture / fermeture (et le cache de pages froid) à chaque clic.
+    Les connexions ne doivent pas être fermées par l'appelant.
+    """
+
+    _PRAGMAS = (
+        "PRAGMA foreign_keys = ON;",
+        "PRAGMA journal_mode = WAL;",
+        "PRAGMA synchronous = NORMAL;",
+        "PRAGMA temp_store = MEMORY;",
+        "PRAGMA cache_size = -64000;",
+    )
+
+    def __init__(self, size=2):
+        self._size = size
+        self._idle = queue.LifoQueue()
+        # compteurs de diagnostic
+        self.stats = {"created": 0, "reused": 0, "closed": 0}
+
+    def _new_conn(self):
+        conn = sqlite3.connect(get_db_path(), timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self._PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.Error:
+                pass
+        self.stats["created"] += 1
+        return conn
+
+    @contextlib.contextmanager
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            self.stats["reused"] += 1
+        except queue.Empty:
+            conn = self._new_conn()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            if self._idle.qsize() < self._size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+                self.stats["closed"] += 1
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self.stats["closed"] += 1
+
+
+_POOL = None
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = _ConnPool()
+        atexit.register(_POOL.close_all)
+    return _POOL
+
+
+_mpl_theme_applied = False
+
+
+def _apply_mpl_theme_once():
+    """Applique le thème matplotlib (rcParams globaux) au premier besoin, une fois par processus."""
+    global _mpl_theme_applied
+    if _mpl_theme_applied:
+        return
+    _mpl_theme_applied = True
+    try:
+        apply_matplotlib_theme = _lazy("apply_matplotlib_theme")
+        if apply_matplotlib_theme:
+            apply_matplotlib_theme()
+    except Exception:
+        pass
+
+
+_NET_PROBE_HOST = ("8.8.8.8", 53)
+_NET_MIN_INTERVAL = 10
+_NET_MAX_INTERVAL = 300
+# exécuteur partagé pour les petites tâches de fond de la vue (sondes réseau, ...) :
+# aucune vue ne possède de thread, rien à joindre à la déconnexion
+_BG_EXEC = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mv-bg")
+atexit.register(_BG_EXEC.shutdown, wait=False)
+
+# rendu du badge réseau, appliqué en un seul configure()
+_NET_LABEL_STYLES = {
+    True: {"text": "Connexion internet est disponible", "fg": "#ffffff", "bg": "#2e7d32", "relief": "raised"},
+    False: {"text": "Connexion internet est indisponible", "fg": "#3a2f00", "bg": "#ffca28", "relief": "raised"},
+}
+
+# requête DNS minimale (en-tête 12 octets, RD=1, QD=1) : google.com, type A, classe IN
+# (l'identifiant de transaction, 2 octets aléatoires, est préfixé à chaque sonde)
+_DNS_QUERY_BODY = b"\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00" + b"\x06google\x03com\x00\x00\x01\x00\x01"
+
+
+@functools.lru_cache(maxsize=1)
+def _net_probe_addr():
+    """Adresse de la sonde réseau, résolue une seule fois par processus."""
+    family, socktype, proto, _, sockaddr = socket.getaddrinfo(*_NET_PROBE_HOST, type=socket.SOCK_DGRAM)[0]
+    return family, socktype, proto, sockaddr
+
+
+@functools.lru_cache(maxsize=8)
+def _get_navbar_logo(size=68):
+    """
+    Logo rond de la barre supérieure, décodé une seule fois par processus
+    (réutilisé à chaque reconnexion). À appeler après la création de la racine Tk.
+    """
+    return charger_image("logo.jpg", (size, size), circle=True)
+
+
+def _unbind_handler(widget, sequence, funcid):
+    """Retire un seul gestionnaire ajouté avec bind(..., add="+") sans toucher aux autres."""
+    try:
+        script = widget.bind(sequence)
+        kept = "\n".join(line for line in script.split("\n") if funcid not in line)
+        widget.bind(sequence, kept)
+        widget.deletecommand(funcid)
+    except Exception:
+        pass
+
+
+def _cached_refresh(orig, ttl=2.0):
+    """
+    Enveloppe une fonction de rafraîchissement : les appels répétés à moins de `ttl` s
+    (clics en rafale, retour de focus) réutilisent le dernier résultat.
+    force=True contourne le cache (bouton « Actualiser » explicite).
+    """
+    last = {"t": None, "v": None}
+
+    def refresh(*args, force=False, **kwargs):
+        now = time.monotonic()
+        if not force and last["t"] is not None and now - last["t"] < ttl:
+            return last["v"]
+        last["v"] = orig(*args, **kwargs)
+        last["t"] = now
+        return last["v"]
+
+    return refresh
+
+
 class MainView(tk.Frame):
-    PERMISSIONS_PAR_ROLE = {"admin": set(), "manager": set(), "agent": set()}
+    PERMISSIONS_PAR_ROLE = _ROLE_PERMS
 
     def __init__(self, parent, controller, on_logout=None, force_top_left=True, **kwargs):
         try:
+            apply_tk_theme = _lazy("apply_tk_theme")
             if apply_tk_theme and isinstance(parent, (tk.Tk, tk.Toplevel)):
                 try:
                     apply_tk_theme(parent)
                 except Exception:
                     pass
-            if apply_matplotlib_theme:
-                try:
-                    apply_matplotlib_theme()
-                except Exception:
-                    pass
         except Exception:
             pass
 
         super().__init__(parent, bg=COULEUR_CORPS_PRINCIPAL)
         self.controller = controller
         self.on_logout = on_logout
-        self._active_button = None
+        # déconnexion confirmée et planifiée (after_idle) : ignore un second clic
+        self._logout_pending = False
         self._menus = {}
-        self._anim_lock = threading.Lock()
         self._sidebar_visible = True
         self._network_ok = None
         self._key_admin_instance = None
-        self._all_permissions = set()
+        self._all_permissions = _ALL_PERMS
         self._current_metrics_refresh = None
-
-        # preload a PIL/photo for the navbar logo (kept as reference to avoid GC)
+        # connexion sqlite réutilisée pour les lectures utilisateur + (nom, role) mémorisés par username
+        self._db = None
+        self._user_rows = {}
+        self._first_contrib_id = None
+        _get_pool()
+        self._current_perms = frozenset()
+
+        # navbar logo (kept as reference to avoid GC) : chargé après le premier affichage
         self._navbar_logo = None
-        try:
-            self._navbar_logo = charger_image("logo.jpg", (68, 68), circle=True)
-        except Exception:
-            self._navbar_logo = None
+        self._navbar_canvas = None
 
         # fonts
         self.title_font = ("Roboto", 15, "bold")
         self.menu_font = ("Segoe UI", 13)
         self.submenu_font = ("Segoe UI", 12)
         self.net_font = ("Segoe UI", 10, "bold")
+        # police des messages d'erreur résolue une fois, partagée par tous les labels d'erreur
+        self._err_font = tkfont.Font(root=self, font=self.submenu_font)
 
         # try to set window title/icon/geometry
         try:
             if hasattr(self.controller, "title"):
                 self.controller.title("Mon Application — Facturation Obr")
-            ico = os.path.join(os.path.dirname(__file__), "..", "assets", "app.ico")
-            ico = os.path.normpath(ico)
-            if os.path.exists(ico) and hasattr(self.controller, "iconbitmap"):
-                self.controller.iconbitmap(ico)
+            if _ICO_EXISTS and hasattr(self.controller, "iconbitmap"):
+                self.controller.iconbitmap(_ICO_PATH)
         except Exception:
             pass
 
@@ -129,6 +375,19 @@ class MainView(tk.Frame):
         self._build_ui()
         self._start_network_checker()
 
+        # thème matplotlib et logo (PIL) différés : le squelette de l'interface s'affiche d'abord
+        self.after_idle(_apply_mpl_theme_once)
+        self.after_idle(self._lazy_load_logo)
+        # le dashboard (et donc l'import de matplotlib) n'est construit qu'après ce premier affichage
+        self.after_idle(self._open_initial_dashboard)
+
+    def _open_initial_dashboard(self):
+        # vue détruite entre-temps, ou l'utilisateur a déjà ouvert un écran : ne rien écraser
+        try:
+            if not self.winfo_exists() or self._active_view is not None:
+                return
+        except _TclError:
+            return
         # open the exclusive dashboard for the current role:
         # admin -> FormulaireGraphiquesDesign only
         # manager -> build_metrics_panel only
@@ -138,16 +397,18 @@ class MainView(tk.Frame):
             chosen_role = str(role).lower() if role else None
 
             if chosen_role == "admin":
+                FormulaireGraphiquesDesign = _lazy("FormulaireGraphiquesDesign")
                 if FormulaireGraphiquesDesign:
-                    self._open_in_content(lambda: FormulaireGraphiquesDesign(self.content_inner))
+                    self._open_in_content(lambda: FormulaireGraphiquesDesign(self._view_parent), key="dash_admin")
                 else:
                     # fallback: if admin graphic form missing, show an informative message only
                     self._show_dashboard_missing("admin")
                 return
 
             if chosen_role == "manager":
+                build_metrics_panel = _lazy("build_metrics_panel")
                 if build_metrics_panel:
-                    self._open_in_content(lambda: self._open_metrics(build_metrics_panel))
+                    self._open_in_content(lambda: self._open_metrics(build_metrics_panel), key="dash_manager")
                 else:
                     # fallback: manager overview missing
                     self._show_dashboard_missing("manager")
@@ -155,8 +416,9 @@ class MainView(tk.Frame):
 
             # agent or no role -> agent dashboard
             if chosen_role == "agent" or chosen_role is None:
+                build_dashboard_overview = _lazy("build_dashboard_overview")
                 if build_dashboard_overview:
-                    self._open_in_content(lambda: build_dashboard_overview(self.content_inner, contrib_id=self._get_first_contrib_id(), low_threshold=5, role_filter="agent"))
+                    self._open_in_content(lambda: build_dashboard_overview(self._view_parent, contrib_id=self._get_first_contrib_id(), low_threshold=5, role_filter="agent"), key="dash_agent")
                 else:
                     # fallback: agent overview missing
                     self._show_dashboard_missing("agent")
@@ -169,84 +431,97 @@ class MainView(tk.Frame):
                 pass
 
     def _show_dashboard_missing(self, role):
-        # Clear and display a single message explaining missing dashboard component
+        # un seul label réutilisé, affiché à la place de la vue courante
+        self._hide_active_view()
         try:
-            for w in list(self.content_inner.winfo_children()):
-                if w is self.error_frame:
-                    continue
-                try:
-                    w.destroy()
-                except Exception:
-                    pass
+            self._missing_label.config(text=f"Le dashboard pour le rôle '{role}' n'est pas disponible (module manquant).")
+            self._missing_label.pack(anchor="nw", padx=20, pady=20)
+            self._active_view = self._missing_label
         except Exception:
             pass
-        try:
-            lbl = tk.Label(self.content_inner,
-                           text=f"Le dashboard pour le rôle '{role}' n'est pas disponible (module manquant).",
-                           bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font, wraplength=900, justify="left")
-            lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
-        except Exception:
-            try:
-                lbl.pack(padx=20, pady=20)
-            except Exception:
-                pass
 
     def _open_metrics(self, build_metrics_fn):
         try:
-            res = build_metrics_fn(self.content_inner, contrib_id=self._get_first_contrib_id(), low_threshold=5)
+            res = build_metrics_fn(self._view_parent, contrib_id=self._get_first_contrib_id(), low_threshold=5)
             if isinstance(res, dict) and "refresh" in res and callable(res["refresh"]):
-                self._current_metrics_refresh = res["refresh"]
+                self._current_metrics_refresh = _cached_refresh(res["refresh"])
         except Exception as e:
             try:
-                tk.Label(self.content_inner, text=f"Erreur ouverture métriques: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font).grid(row=0, column=0, sticky="nw", padx=20, pady=20)
+                tk.Label(self._view_parent, text=f"Erreur ouverture métriques: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font).grid(row=0, column=0, sticky="nw", padx=20, pady=20)
             except Exception:
                 try:
-                    tk.Label(self.content_inner, text=f"Erreur ouverture métriques: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font).pack(padx=20, pady=20)
+                    tk.Label(self._view_parent, text=f"Erreur ouverture métriques: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font).pack(padx=20, pady=20)
                 except Exception:
                     pass
+            return False
+
+    def _user_db(self):
+        """
+        Connexion de lecture pour les métadonnées utilisateur : ouverte en lecture seule
+        (URI mode=ro) quand c'est possible, avec query_only en défense supplémentaire.
+        Même base que le reste de l'application (get_db_path) ; jamais de création de fichier :
+        si la base est absente, sqlite3.Error remonte et les appelants renvoient (None, None).
+        """
+        if self._db is None:
+            uri = Path(get_db_path()).resolve().as_uri()
+            conn = None
+            try:
+                conn = sqlite3.connect(uri + "?mode=ro", uri=True, check_same_thread=False)
+                # l'ouverture est paresseuse : vérifier tout de suite que la base est lisible
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+            except sqlite3.Error:
+                # WAL sans -shm accessible en lecture seule : lecture-écriture, sans création
+                if conn is not None:
+                    conn.close()
+                conn = sqlite3.connect(uri + "?mode=rw", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            try:
+                conn.execute("PRAGMA query_only = 1")
+            except sqlite3.Error:
+                pass
+            self._db = conn
+        return self._db
+
+    def _user_row(self, username):
+        """
+        Retourne (nom, role) pour username, en une seule requête mémorisée pour la vue.
+        Les erreurs ne sont pas mémorisées (nouvel essai au prochain appel).
+        """
+        try:
+            return self._user_rows[username]
+        except KeyError:
+            pass
+        try:
+            row = self._user_db().execute(
+                "SELECT nom, role FROM utilisateur_societe WHERE username = ?", (username,)
+            ).fetchone()
+        except Exception:
+            return (None, None)
+        info = (row["nom"], row["role"]) if row else (None, None)
+        self._user_rows[username] = info
+        return info
 
     def _get_user_fields(self):
         s = global_session
         if not s or getattr(s, "username", None) is None:
             return ("Invité", "guest")
-        try:
-            conn = sqlite3.connect("facturation_obr.db")
-            cur = conn.cursor()
-            cur.execute("SELECT nom FROM utilisateur_societe WHERE username = ?", (s.username,))
-            row = cur.fetchone()
-            conn.close()
-            display = row[0] if row and row[0] else s.username
-        except Exception:
-            display = s.username
-        return (display, s.username)
+        nom = self._user_row(s.username)[0]
+        return (nom or s.username, s.username)
 
     def _load_permissions_for_user(self, username):
+        # frozensets partagés de _ROLE_PERMS : pas de copie, les appelants ne font que des tests `in`
         if not username:
-            return set()
-        try:
-            conn = sqlite3.connect("facturation_obr.db")
-            cur = conn.cursor()
-            cur.execute("SELECT role FROM utilisateur_societe WHERE username = ?", (username,))
-            row = cur.fetchone()
-            conn.close()
-            if row and row[0]:
-                role = row[0]
-                perms = self.PERMISSIONS_PAR_ROLE.get(role)
-                if perms is not None:
-                    return set(perms)
-        except Exception:
-            pass
+            return frozenset()
+        role = self._user_row(username)[1]
+        if role:
+            perms = self.PERMISSIONS_PAR_ROLE.get(role)
+            if perms is not None:
+                return perms
         perms = self.PERMISSIONS_PAR_ROLE.get(username)
-        return set(perms) if perms else set()
+        return perms or frozenset()
 
     def _a_permission(self, perm):
-        uname = self._get_user_fields()[1]
-        if not uname:
-            return False
-        if not hasattr(self, "_cached_permissions") or getattr(self, "_cached_permissions_user", None) != uname:
-            self._cached_permissions_user = uname
-            self._cached_permissions = self._load_permissions_for_user(uname)
-        return perm in self._cached_permissions
+        return perm in self._current_perms
 
     def _build_ui(self):
         self.barre_superieure = tk.Frame(self, bg=COULEUR_BARRE_SUPERIEURE, height=72)
@@ -254,10 +529,14 @@ class MainView(tk.Frame):
 
         center = tk.Frame(self, bg=COULEUR_CORPS_PRINCIPAL)
         center.pack(side="top", fill="both", expand=True)
+        # grille fixe : la barre latérale possède la colonne 0, le contenu la colonne 1 ;
+        # masquer/réafficher la barre ne replace jamais le contenu
+        center.grid_rowconfigure(0, weight=1)
+        center.grid_columnconfigure(1, weight=1)
 
         sidebar_w = 320
         self.sidebar_container = tk.Frame(center, bg=COULEUR_MENU_LATERAL, width=sidebar_w)
-        self.sidebar_container.pack(side="left", fill="y")
+        self.sidebar_container.grid(row=0, column=0, sticky="ns")
         self.sidebar_container.pack_propagate(False)
 
         self.sidebar_canvas = tk.Canvas(self.sidebar_container, bg=COULEUR_MENU_LATERAL, highlightthickness=0)
@@ -277,11 +556,13 @@ class MainView(tk.Frame):
         self.sidebar_inner = tk.Frame(self.sidebar_canvas, bg=COULEUR_MENU_LATERAL)
         self.sidebar_window = self.sidebar_canvas.create_window((0, 0), window=self.sidebar_inner, anchor="nw")
 
-        self.sidebar_inner.bind("<Configure>", lambda e: self.sidebar_canvas.configure(scrollregion=self.sidebar_canvas.bbox("all")))
+        # scrollregion recalculée au plus une fois par passage idle, quel que soit le nombre de <Configure>
+        self._pending_scroll_update = set()
+        self.sidebar_inner.bind("<Configure>", lambda e: self._schedule_scroll_update(self.sidebar_canvas))
         self.sidebar_canvas.bind("<Configure>", lambda e: self.sidebar_canvas.itemconfig(self.sidebar_window, width=e.width))
 
         self.content_container = tk.Frame(center, bg=COULEUR_CORPS_PRINCIPAL)
-        self.content_container.pack(side="right", fill="both", expand=True)
+        self.content_container.grid(row=0, column=1, sticky="nsew")
 
         # content canvas + internal frame pattern (robuste)
         self.content_canvas = tk.Canvas(self.content_container, bg=COULEUR_CORPS_PRINCIPAL, highlightthickness=0)
@@ -306,34 +587,47 @@ class MainView(tk.Frame):
         def _on_canvas_config(event):
             try:
                 self.content_canvas.itemconfig(self.content_window, width=event.width)
-                self.content_canvas.configure(scrollregion=self.content_canvas.bbox("all"))
             except Exception:
                 pass
+            self._schedule_scroll_update(self.content_canvas)
 
-        self.content_inner.bind("<Configure>", lambda e: self.content_canvas.configure(scrollregion=self.content_canvas.bbox("all")))
+        # <Configure> de content_inner reste nécessaire : c'est le seul signal quand une vue chargée change de hauteur
+        self.content_inner.bind("<Configure>", lambda e: self._schedule_scroll_update(self.content_canvas))
         self.content_canvas.bind("<Configure>", _on_canvas_config)
 
         # mouse wheel handling for content area (bind only while pointer inside)
-        def _on_mousewheel(event):
+        # appelé à chaque cran de molette : méthode liée résolue une fois, arithmétique entière
+        def _on_mousewheel(event, _yview=self.content_canvas.yview_scroll):
+            d = event.delta
             try:
-                if hasattr(event, "delta") and event.delta:
-                    delta = -1 * int(event.delta / 120)
-                    self.content_canvas.yview_scroll(delta, "units")
-                else:
-                    if event.num == 4:
-                        self.content_canvas.yview_scroll(-1, "units")
-                    elif event.num == 5:
-                        self.content_canvas.yview_scroll(1, "units")
-            except Exception:
+                if d:
+                    # même troncature que int(d / 120), sans division flottante
+                    q = abs(d) // 120
+                    _yview(-q if d > 0 else q, "units")
+                elif event.num == 4:
+                    _yview(-1, "units")
+                elif event.num == 5:
+                    _yview(1, "units")
+            except _TclError:
+                # canvas détruit alors que la liaison globale était encore active
                 pass
 
+        # un seul gestionnaire <Enter>/<Leave> pour les trois événements molette
+        # (Windows/macOS : <MouseWheel>, X11 : <Button-4>/<Button-5>) ; bind_all reste nécessaire
+        # pour que la molette fonctionne aussi au-dessus des widgets enfants de la vue
         def _bind_mousewheel_to_canvas(w):
-            w.bind("<Enter>", lambda e: w.bind_all("<MouseWheel>", _on_mousewheel))
-            w.bind("<Leave>", lambda e: w.unbind_all("<MouseWheel>"))
-            w.bind("<Enter>", lambda e: w.bind_all("<Button-4>", _on_mousewheel))
-            w.bind("<Leave>", lambda e: w.unbind_all("<Button-4>"))
-            w.bind("<Enter>", lambda e: w.bind_all("<Button-5>", _on_mousewheel))
-            w.bind("<Leave>", lambda e: w.unbind_all("<Button-5>"))
+            def _enter(e):
+                w.bind_all("<MouseWheel>", _on_mousewheel)
+                w.bind_all("<Button-4>", _on_mousewheel)
+                w.bind_all("<Button-5>", _on_mousewheel)
+
+            def _leave(e):
+                w.unbind_all("<MouseWheel>")
+                w.unbind_all("<Button-4>")
+                w.unbind_all("<Button-5>")
+
+            w.bind("<Enter>", _enter)
+            w.bind("<Leave>", _leave)
 
         _bind_mousewheel_to_canvas(self.content_canvas)
 
@@ -347,9 +641,56 @@ class MainView(tk.Frame):
             except Exception:
                 pass
 
+        # emplacement unique des vues : chaque vue est construite dans son propre cadre ;
+        # les tableaux de bord (un par rôle, donc 3 au plus) sont masqués puis réaffichés, pas détruits
+        self.content_inner.columnconfigure(0, weight=1)
+        self._view_slot = tk.Frame(self.content_inner, bg=COULEUR_CORPS_PRINCIPAL)
+        self._view_slot.grid(row=1, column=0, sticky="nsew")
+        self._view_parent = self._view_slot
+        # borné par _CACHEABLE_VIEWS (dashboard du rôle + graphiques) : pas d'éviction nécessaire
+        self._view_cache = {}
+        self._active_view = None
+        self._missing_label = tk.Label(self._view_slot, text="", bg=COULEUR_CORPS_PRINCIPAL, fg="#900",
+                                       font=self._err_font, wraplength=900, justify="left")
+
+        # survol des boutons latéraux géré par ttk (style map) plutôt que par des <Enter>/<Leave> Python ;
+        # les styles sont propres au thème courant : on les réapplique si un écran change de thème
+        self._configure_sidebar_styles()
+        self.bind("<<ThemeChanged>>", lambda e: self._configure_sidebar_styles())
+
         self._build_topbar_contents()
         self._build_sidebar_items()
 
+    def _configure_sidebar_styles(self):
+        try:
+            style = ttk.Style(self)
+            for name, font in (("Sidebar.TButton", self.menu_font),
+                               ("SidebarSub.TButton", self.submenu_font),
+                               ("SidebarDash.TButton", ("Segoe UI", 13, "bold"))):
+                style.configure(name, background=COULEUR_MENU_LATERAL, foreground="white", font=font,
+                                anchor="w", borderwidth=0, relief="flat", focusthickness=0,
+                                bordercolor=COULEUR_MENU_LATERAL, lightcolor=COULEUR_MENU_LATERAL,
+                                darkcolor=COULEUR_MENU_LATERAL)
+                style.map(name,
+                          background=[("disabled", COULEUR_MENU_LATERAL), ("pressed", COULEUR_MENU_SURVOL),
+                                      ("active", COULEUR_MENU_SURVOL)],
+                          foreground=[("disabled", "#8ca3ba")])
+        except Exception:
+            pass
+
+    def _schedule_scroll_update(self, canvas):
+        if canvas in self._pending_scroll_update:
+            return
+        self._pending_scroll_update.add(canvas)
+        self.after_idle(self._do_scroll_update, canvas)
+
+    def _do_scroll_update(self, canvas):
+        self._pending_scroll_update.discard(canvas)
+        try:
+            canvas.configure(scrollregion=canvas.bbox("all"))
+        except Exception:
+            pass
+
     def _build_topbar_contents(self):
         logo_outer = tk.Frame(self.barre_superieure, bg=COULEUR_BARRE_SUPERIEURE)
         logo_outer.pack(side="left", padx=8, pady=8)
@@ -363,12 +704,9 @@ class MainView(tk.Frame):
         c.create_oval(4, 4, 4 + size, 4 + size, fill="#dddddd", outline="")
         c.create_oval(0, 0, size, size, fill="white", outline="#e6e6e6", width=1)
 
-        img = self._navbar_logo
-        if img:
-            c.image = img
-            cx = canvas_w // 2
-            cy = canvas_h // 2
-            c.create_image(cx, cy, image=img, anchor="center")
+        self._navbar_canvas = c
+        if self._navbar_logo:
+            self._draw_navbar_logo()
 
         btn_toggle = tk.Button(self.barre_superieure, text="☰", bg=COULEUR_BARRE_SUPERIEURE, fg="white", bd=0,
                                font=("Segoe UI", 14, "bold"), command=self.toggle_menu, padx=10, pady=6)
@@ -392,6 +730,22 @@ class MainView(tk.Frame):
                              font=("Segoe UI", 12, "bold"), command=self._on_logout_button, padx=12, pady=6)
         btn_deco.pack(side="right", padx=12, pady=8)
 
+    def _lazy_load_logo(self):
+        try:
+            self._navbar_logo = _get_navbar_logo()
+        except Exception:
+            self._navbar_logo = None
+        if self._navbar_logo and self._navbar_canvas is not None:
+            self._draw_navbar_logo()
+
+    def _draw_navbar_logo(self):
+        c = self._navbar_canvas
+        try:
+            c.image = self._navbar_logo
+            c.create_image(int(c["width"]) // 2, int(c["height"]) // 2, image=self._navbar_logo, anchor="center")
+        except Exception:
+            pass
+
     def _build_sidebar_items(self):
         inner = self.sidebar_inner
         header = tk.Frame(inner, bg=COULEUR_MENU_LATERAL)
@@ -404,159 +758,39 @@ class MainView(tk.Frame):
                  font=("Segoe UI", 14, "bold")
         ).pack(side="top", padx=12, anchor="w", pady=(0, 6))
 
-        self._all_permissions = set()
         self._menus = {}
 
-        def create_menu(title, icon, items):
-            for _, _, perm in items:
-                if perm:
-                    self._all_permissions.add(perm)
-
-            hdr = tk.Button(inner, text=f"{icon}   {title}", anchor="w", bd=0, bg=COULEUR_MENU_LATERAL, fg="white",
-                             activebackground=COULEUR_MENU_SURVOL, font=self.menu_font)
-            hdr.pack(fill="x", padx=12, pady=(8, 6))
-            hdr.bind("<Enter>", lambda e: hdr.config(bg=COULEUR_MENU_SURVOL))
-            hdr.bind("<Leave>", lambda e: hdr.config(bg=COULEUR_MENU_LATERAL))
-
-            cont = tk.Frame(inner, bg=COULEUR_MENU_LATERAL)
-            cont.pack_forget()
-
-            def expand_with_animation(frame, expand=True, steps=6, delay=12):
-                if not self._anim_lock.acquire(blocking=False):
-                    if expand:
-                        frame.pack(fill="x", padx=(28, 0))
-                    else:
-                        frame.pack_forget()
-                    self.sidebar_canvas.config(scrollregion=self.sidebar_canvas.bbox("all"))
-                    return
-
-                def worker():
-                    try:
-                        if expand:
-                            frame.pack(fill="x", padx=(28, 0))
-                            for _ in range(steps):
-                                time.sleep(delay / 1000.0)
-                                try:
-                                    self.sidebar_canvas.update_idletasks()
-                                except Exception:
-                                    pass
-                        else:
-                            for _ in range(steps):
-                                time.sleep(delay / 1000.0)
-                            try:
-                                frame.pack_forget()
-                            except Exception:
-                                pass
-                        self.sidebar_canvas.after(1, lambda: self.sidebar_canvas.config(scrollregion=self.sidebar_canvas.bbox("all")))
-                    finally:
-                        try:
-                            self._anim_lock.release()
-                        except Exception:
-                            pass
-
-                threading.Thread(target=worker, daemon=True).start()
-
-            def on_header_click():
-                for k, (frame, expanded) in list(self._menus.items()):
-                    if k != title and expanded:
-                        self._menus[k] = (frame, False)
-                        expand_with_animation(frame, expand=False)
-                frm, expanded = self._menus.get(title, (cont, False))
-                if expanded:
-                    self._menus[title] = (cont, False)
-                    expand_with_animation(cont, expand=False)
-                else:
-                    self._menus[title] = (cont, True)
-                    expand_with_animation(cont, expand=True)
-
-            hdr.config(command=on_header_click)
-
-            def _build_loader(callback):
-                def loader():
-                    try:
-                        if callable(callback):
-                            try:
-                                res = callback(self.content_inner)
-                            except TypeError:
-                                res = callback()
-                            if isinstance(res, tk.Widget):
-                                try:
-                                    res.pack(fill="both", expand=True)
-                                except Exception:
-                                    pass
-                        else:
-                            try:
-                                if isinstance(callback, type) and issubclass(callback, tk.Widget):
-                                    inst = callback(self.content_inner)
-                                    try:
-                                        inst.pack(fill="both", expand=True)
-                                    except Exception:
-                                        pass
-                            except Exception:
-                                pass
-                    except Exception as e:
-                        try:
-                            for ch in list(self.error_frame.winfo_children()):
-                                ch.destroy()
-                        except Exception:
-                            pass
-                        try:
-                            lbl = tk.Label(self.error_frame, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font, wraplength=800, justify="left")
-                            lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
-                        except Exception:
-                            try:
-                                tk.Label(self.content_inner, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font).pack(padx=20, pady=20)
-                            except Exception:
-                                pass
-                return loader
-
-            for txt, fn, perm in items:
-                sub = tk.Button(cont, text=f"•   {txt}", anchor="w", bd=0, bg=COULEUR_MENU_LATERAL, fg="white",
-                                 activebackground=COULEUR_MENU_SURVOL, font=self.submenu_font)
-                sub.pack(fill="x", pady=6)
-                sub.bind("<Enter>", lambda e, b=sub: b.config(bg=COULEUR_MENU_SURVOL))
-                sub.bind("<Leave>", lambda e, b=sub: b.config(bg=COULEUR_MENU_LATERAL))
-
-                sub._perm_key = perm
-                loader_callable = _build_loader(fn)
-
-                try:
-                    if perm is None or self._a_permission(perm):
-                        sub.config(command=lambda lc=loader_callable: self._open_in_content(lc), state="normal")
-                    else:
-                        sub.config(command=lambda lc=loader_callable: self._open_in_content(lc), state="disabled")
-                except Exception:
-                    sub.config(state="disabled")
-
-            self._menus[title] = (cont, False)
-            return hdr, cont
+        uname = self._get_user_fields()[1]
+        perms = self._load_permissions_for_user(uname)
+        self._current_perms = perms
 
         current_role = getattr(global_session, "role", None)
         current_role = str(current_role).lower() if current_role else None
 
         def _open_dashboard_role(role):
             def loader():
-                self._set_active(None)
                 self.nettoyer_corps()
                 try:
                     # exclusive mapping for role buttons as well:
                     if role == "admin":
+                        FormulaireGraphiquesDesign = _lazy("FormulaireGraphiquesDesign")
                         if FormulaireGraphiquesDesign:
-                            FormulaireGraphiquesDesign(self.content_inner)
+                            FormulaireGraphiquesDesign(self._view_parent)
                             return
                         self._show_dashboard_missing("admin")
                         return
 
                     if role == "manager":
+                        build_metrics_panel = _lazy("build_metrics_panel")
                         if build_metrics_panel:
-                            self._open_metrics(build_metrics_panel)
-                            return
+                            return self._open_metrics(build_metrics_panel)
                         self._show_dashboard_missing("manager")
                         return
 
                     if role == "agent":
+                        build_dashboard_overview = _lazy("build_dashboard_overview")
                         if build_dashboard_overview:
-                            build_dashboard_overview(self.content_inner, contrib_id=self._get_first_contrib_id(), low_threshold=5, role_filter="agent")
+                            build_dashboard_overview(self._view_parent, contrib_id=self._get_first_contrib_id(), low_threshold=5, role_filter="agent")
                             return
                         self._show_dashboard_missing("agent")
                         return
@@ -569,320 +803,482 @@ class MainView(tk.Frame):
                     except Exception:
                         pass
                     try:
-                        lbl = tk.Label(self.error_frame, text=f"Erreur dashboard {role}: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font, wraplength=800, justify="left")
+                        lbl = tk.Label(self.error_frame, text=f"Erreur dashboard {role}: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font, wraplength=800, justify="left")
                         lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
                     except Exception:
                         try:
-                            tk.Label(self.content_inner, text=f"Erreur dashboard {role}: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font).pack(padx=20, pady=20)
+                            tk.Label(self.content_inner, text=f"Erreur dashboard {role}: {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font).pack(padx=20, pady=20)
                         except Exception:
                             pass
+                    return False
             return loader
 
-        # show only the dashboard buttons relevant to user's role (keeps UI simple & avoids confusion)
-        if current_role == "admin":
-            btn_dash_admin = tk.Button(inner, text="🏛️ Dashboard Admin", anchor="w", bd=0, bg=COULEUR_MENU_LATERAL, fg="white",
-                                       activebackground=COULEUR_MENU_SURVOL, font=("Segoe UI", 13, "bold"),
-                                       command=lambda: self._open_in_content(_open_dashboard_role("admin")))
-            btn_dash_admin.pack(fill="x", padx=12, pady=(8, 6))
-            btn_dash_admin.bind("<Enter>", lambda e: btn_dash_admin.config(bg=COULEUR_MENU_SURVOL))
-            btn_dash_admin.bind("<Leave>", lambda e: btn_dash_admin.config(bg=COULEUR_MENU_LATERAL))
-
-        if current_role == "manager":
-            btn_dash_manager = tk.Button(inner, text="🏢 Dashboard Manager", anchor="w", bd=0, bg=COULEUR_MENU_LATERAL, fg="white",
-                                         activebackground=COULEUR_MENU_SURVOL, font=("Segoe UI", 13, "bold"),
-                                         command=lambda: self._open_in_content(_open_dashboard_role("manager")))
-            btn_dash_manager.pack(fill="x", padx=12, pady=(8, 6))
-            btn_dash_manager.bind("<Enter>", lambda e: btn_dash_manager.config(bg=COULEUR_MENU_SURVOL))
-            btn_dash_manager.bind("<Leave>", lambda e: btn_dash_manager.config(bg=COULEUR_MENU_LATERAL))
-
-        if current_role == "agent" or current_role is None:
-            btn_dash_agent = tk.Button(inner, text="👷 Dashboard Agent", anchor="w", bd=0, bg=COULEUR_MENU_LATERAL, fg="white",
-                                       activebackground=COULEUR_MENU_SURVOL, font=("Segoe UI", 13, "bold"),
-                                       command=lambda: self._open_in_content(_open_dashboard_role("agent")))
-            btn_dash_agent.pack(fill="x", padx=12, pady=(8, 6))
-            btn_dash_agent.bind("<Enter>", lambda e: btn_dash_agent.config(bg=COULEUR_MENU_SURVOL))
-            btn_dash_agent.bind("<Leave>", lambda e: btn_dash_agent.config(bg=COULEUR_MENU_LATERAL))
+        # show only the dashboard button relevant to user's role (keeps UI simple & avoids confusion)
+        dash_role = current_role or "agent"
+        if dash_role in _ROLE_DASH:
+            ttk.Button(inner, text=_ROLE_DASH[dash_role], style="SidebarDash.TButton",
+                       command=lambda: self._open_in_content(_open_dashboard_role(dash_role), key=f"dash_{dash_role}")
+                       ).pack(fill="x", padx=12, pady=(8, 6))
 
         # menus (clients, factures, articles, etc.)
-        create_menu("Clients", "👥", [
-            ("Lister les clients", afficher_liste_clients, "clients_view"),
-        ])
-
-        create_menu("Factures", "📄", [
-            ("Lister les factures", afficher_liste_factures, "factures_view"),
-            ("Créer une facture avec stock ", afficher_formulaire_facture, "factures_declare_create"),
-            ("Créer une facture sans stock ", afficher_formulaire_facture_manual, "factures_nondeclare_create"),
-        ])
-
-        create_menu("Articles", "📦", [
-            ("Articles déclarés réuissis", show_obr_articles, "articles_reuissi_view"),
-            ("Articles déclarés non réuissis", show_failed_articles, "articles_echec_view"),
-            ("Entrée & déclaration", formulaire_entree_et_declaration, "articles_create"),
-        ])
-
-        create_menu("Articles Importés", "📥", [
-            ("Articles Importes déclarés réuissis", show_obr_articles_import, "articles_create"),
-            ("Articles Importes déclarés echec", FailedImportsFrame, "articles_create"),
-            ("Déclarés Articles Importes", lambda parent=None: self._open_import_batch(parent), "articles_import_create"),
-        ])
-
-        create_menu("Utilisateurs", "👤", [
-            ("Lister les utilisateurs", afficher_tableau_utilisateurs, "utilisateurs_view"),
-            ("Créer un utilisateur", afficher_formulaire_utilisateur_societe, "utilisateurs_create"),
-        ])
-
-        # finalize permissions and set initial enable/disable
+        # propagation suspendue pendant la création : sidebar_inner ne change de taille (et ne
+        # déclenche <Configure>) qu'une fois, quand tous les boutons sont en place
+        inner.pack_propagate(False)
         try:
-            all_perms = set(self._all_permissions)
-            self.PERMISSIONS_PAR_ROLE["admin"] = set(all_perms)
-            self.PERMISSIONS_PAR_ROLE["manager"] = set(all_perms)
-            allowed_for_agent = set(p for p in all_perms if p.startswith("clients_") or p.startswith("factures_") or p in ("dashboard",))
-            self.PERMISSIONS_PAR_ROLE["agent"] = allowed_for_agent
+            for title, icon, items in _MENU_SPEC:
+                self._create_menu(title, icon, items, perms)
+        finally:
+            inner.pack_propagate(True)
 
-            try:
-                if hasattr(self, "_cached_permissions_user"):
-                    self._cached_permissions_user = None
-                    self._cached_permissions = None
-                for title, (frame, _) in self._menus.items():
-                    for w in frame.winfo_children():
-                        try:
-                            perm = getattr(w, "_perm_key", None)
-                            if perm:
-                                if self._a_permission(perm):
-                                    w.config(state="normal")
-                                else:
-                                    w.config(state="disabled")
-                            else:
-                                w.config(state="normal")
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-        except Exception:
-            pass
+    def _create_menu(self, title, icon, items, perms):
+        inner = self.sidebar_inner
+        hdr = ttk.Button(inner, text=f"{icon}   {title}", style="Sidebar.TButton",
+                         command=lambda t=title: self._toggle_submenu(t))
+        hdr.pack(fill="x", padx=12, pady=(8, 6))
+
+        cont = tk.Frame(inner, bg=COULEUR_MENU_LATERAL)
+        cont.pack_forget()
+
+        for txt, name, perm in items:
+            sub = ttk.Button(cont, text=f"•   {txt}", style="SidebarSub.TButton",
+                             command=lambda n=name: self._dispatch(n),
+                             state="normal" if perm is None or perm in perms else "disabled")
+            sub.pack(fill="x", pady=6)
+            sub._perm_key = perm
+
+        self._menus[title] = (cont, False)
+        return hdr, cont
+
+    def _toggle_submenu(self, title):
+        for k, (frame, expanded) in list(self._menus.items()):
+            if k != title and expanded:
+                self._menus[k] = (frame, False)
+                self._animate_submenu(frame, expand=False)
+        cont, expanded = self._menus[title]
+        self._menus[title] = (cont, not expanded)
+        self._animate_submenu(cont, expand=not expanded)
+
+    def _animate_submenu(self, frame, expand=True, steps=6, delay=12):
+        # animation coopérative sur la boucle Tk : pas de thread ni de time.sleep,
+        # tous les pack/pack_forget restent sur le thread principal
+        frame._anim_expand = expand
+        frame._anim_remaining = steps
+        if expand:
+            frame.pack(fill="x", padx=(28, 0))
+        if getattr(frame, "_anim_inflight", False):
+            # une animation tourne déjà pour ce cadre : elle prendra la nouvelle cible
+            return
+        frame._anim_inflight = True
+        self.after(delay, self._animate_submenu_step, frame, delay)
 
-    def _get_first_contrib_id(self):
+    def _animate_submenu_step(self, frame, delay):
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM contribuable ORDER BY id LIMIT 1")
-            r = cur.fetchone()
-            conn.close()
-            return r[0] if r else None
+            if frame._anim_remaining > 0:
+                frame._anim_remaining -= 1
+                self.after(delay, self._animate_submenu_step, frame, delay)
+                return
+            frame._anim_inflight = False
+            if not frame._anim_expand:
+                frame.pack_forget()
+            self.sidebar_canvas.config(scrollregion=self.sidebar_canvas.bbox("all"))
         except Exception:
-            return None
+            frame._anim_inflight = False
+
+    def _dispatch(self, name):
+        """Point d'entrée unique des sous-menus : `name` vient de _MENU_SPEC."""
+        if name in _WRITING_SCREENS:
+            self._invalidate_views()
+        self._open_in_content(functools.partial(self._load_screen, name))
 
-    def _open_in_content(self, loader_callable):
-        self._set_active(None)
-        # clear previous content (except error_frame)
+    def _load_screen(self, name):
         try:
-            for w in list(self.content_inner.winfo_children()):
-                if w is self.error_frame:
-                    continue
+            # "_xxx" : méthode de la vue ; sinon nom du registre _lazy_imports (import au premier clic)
+            callback = getattr(self, name) if name.startswith("_") else _lazy(name)
+            if callable(callback):
+                try:
+                    res = callback(self._view_parent)
+                except TypeError:
+                    res = callback()
+                if isinstance(res, tk.Widget):
+                    try:
+                        res.pack(fill="both", expand=True)
+                    except Exception:
+                        pass
+        except Exception as e:
+            try:
+                for ch in list(self.error_frame.winfo_children()):
+                    ch.destroy()
+            except Exception:
+                pass
+            try:
+                lbl = tk.Label(self.error_frame, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font, wraplength=800, justify="left")
+                lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
+            except Exception:
                 try:
-                    w.destroy()
+                    tk.Label(self.content_inner, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font).pack(padx=20, pady=20)
                 except Exception:
                     pass
+            return False
+
+    def _get_first_contrib_id(self):
+        # stable pour toute la session : mémorisé sur l'instance, remis à zéro à la déconnexion
+        if self._first_contrib_id is not None:
+            return self._first_contrib_id
+        try:
+            with _get_pool().acquire() as conn:
+                r = conn.execute("SELECT id FROM contribuable ORDER BY id LIMIT 1").fetchone()
         except Exception:
-            pass
+            return None
+        self._first_contrib_id = r[0] if r else None
+        return self._first_contrib_id
 
-        # clear error_frame children
+    def _hide_active_view(self):
+        view, self._active_view = self._active_view, None
+        if view is None:
+            return
         try:
-            for ch in list(self.error_frame.winfo_children()):
-                try:
-                    ch.destroy()
-                except Exception:
-                    pass
+            if view is self._missing_label or view in self._view_cache.values():
+                view.pack_forget()
+            else:
+                view.destroy()
+                if self._view_parent is view:
+                    self._view_parent = self._view_slot
         except Exception:
             pass
 
+    def _open_in_content(self, loader_callable, key=None):
+        # une vue peut créer des figures : le thème matplotlib doit déjà être appliqué
+        _apply_mpl_theme_once()
+        # une seule passe : messages d'erreur + labels de secours posés dans content_inner
+        for w in self._stray_content_widgets(self.error_frame.winfo_children()):
+            with contextlib.suppress(_TclError):
+                w.destroy()
+
+        self._hide_active_view()
+        cached = self._view_cache.get(key) if key is not None else None
+        if cached is not None:
+            # vue déjà construite : simple réaffichage
+            cached.pack(fill="both", expand=True)
+            self._active_view = cached
+            # retour sur le dashboard manager : rafraîchir ses métriques, au plus une fois par TTL
+            if key == "dash_manager" and self._current_metrics_refresh is not None:
+                with contextlib.suppress(Exception):
+                    self._current_metrics_refresh()
+            with contextlib.suppress(_TclError):
+                self.content_canvas.yview_moveto(0)
+            return
+
+        view = tk.Frame(self._view_slot, bg=COULEUR_CORPS_PRINCIPAL)
+        view.pack(fill="both", expand=True)
+        self._active_view = self._view_parent = view
+        # un chargeur qui échoue (exception, ou False quand il a affiché lui-même l'erreur)
+        # n'est jamais mis en cache : la vue sera reconstruite au prochain clic
+        ok = False
         try:
-            loader_callable()
+            ok = loader_callable() is not False
         except Exception as e:
             try:
-                lbl_err = tk.Label(self.error_frame, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font, wraplength=800, justify="left")
-                lbl_err.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
-            except Exception:
-                try:
-                    lbl_err = tk.Label(self.content_inner, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self.submenu_font)
-                    lbl_err.pack(padx=20, pady=20)
-                except Exception:
-                    pass
-        try:
+                tk.Label(self.error_frame, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font, wraplength=800, justify="left"
+                         ).grid(row=0, column=0, sticky="nw", padx=20, pady=20)
+            except _TclError:
+                with contextlib.suppress(_TclError):
+                    tk.Label(self.content_inner, text=f"Erreur ouverture vue : {e}", bg=COULEUR_CORPS_PRINCIPAL, fg="#900", font=self._err_font).pack(padx=20, pady=20)
+        # le chargeur a pu remplacer la vue (ex. dashboard manquant) : ne garder que si elle est toujours affichée
+        if ok and key in _CACHEABLE_VIEWS and self._active_view is view:
+            self._view_cache[key] = view
+        with contextlib.suppress(_TclError):
             self.content_canvas.yview_moveto(0)
-        except Exception:
-            pass
+
+    def _invalidate_views(self):
+        """Oublie les vues en cache (détruites, sauf celle affichée qui le sera en la quittant)."""
+        cached, self._view_cache = self._view_cache, {}
+        for view in cached.values():
+            if view is self._active_view:
+                continue
+            with contextlib.suppress(_TclError):
+                view.destroy()
 
     def ouvrir_graphiques(self, parent=None):
-        self._set_active(None)
-        self.nettoyer_corps()
-        try:
-            try:
-                from gui.form_graficas_design import FormulaireGraphiquesDesign as _FGD
-            except Exception:
-                _FGD = None
+        self._open_in_content(self._build_graphiques, key="graphiques")
 
-            if _FGD:
-                _FGD(self.content_inner)
-            else:
-                lbl = tk.Label(self.error_frame, text="Dashboard (à implémenter)", bg=COULEUR_CORPS_PRINCIPAL, font=self.title_font)
-                try:
-                    lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
-                except Exception:
-                    lbl.pack(padx=20, pady=20)
-        except Exception:
-            try:
-                lbl = tk.Label(self.error_frame, text="Graphiques indisponible", bg=COULEUR_CORPS_PRINCIPAL, font=self.title_font)
-                lbl.grid(row=0, column=0, sticky="nw", padx=20, pady=20)
-            except Exception:
-                tk.Label(self.content_inner, text="Graphiques indisponible", bg=COULEUR_CORPS_PRINCIPAL, font=self.title_font).pack(padx=20, pady=20)
+    def _build_graphiques(self):
+        # résolu une seule fois via le registre paresseux (None si le module est absent)
+        _FGD = _lazy("FormulaireGraphiquesDesign")
         try:
-            self.content_canvas.yview_moveto(0)
+            if _FGD:
+                _FGD(self._view_parent)
+                return
+            text = "Dashboard (à implémenter)"
         except Exception:
-            pass
+            text = "Graphiques indisponible"
+        with contextlib.suppress(_TclError):
+            tk.Label(self.error_frame, text=text, bg=COULEUR_CORPS_PRINCIPAL, font=self.title_font
+                     ).grid(row=0, column=0, sticky="nw", padx=20, pady=20)
+        return False
 
     def _open_import_batch(self, parent=None):
-        parent = parent or self.content_inner
+        parent = parent or self._view_parent
         self.nettoyer_corps()
-        frame = ImportStockBatchFrame(parent,
+        frame = _lazy("ImportStockBatchFrame")(parent,
                                       get_connection_fn=get_connection,
-                                      obtenir_token_fn=obtenir_token_auto,
-                                      get_system_id_fn=get_system_id,
+                                      obtenir_token_fn=_lazy("obtenir_token_auto"),
+                                      get_system_id_fn=_lazy("get_system_id"),
                                       contribuable_id=self._get_first_contrib_id())
         frame.pack(fill="both", expand=True, padx=12, pady=12)
 
+    def _stray_content_widgets(self, extra=()):
+        """Enfants directs de content_inner hors error_frame / _view_slot, suivis de `extra`."""
+        keep = (self.error_frame, self._view_slot)
+        return itertools.chain([w for w in self.content_inner.winfo_children() if w not in keep], extra)
+
     def nettoyer_corps(self):
-        for w in list(self.content_inner.winfo_children()):
-            if w is self.error_frame:
-                continue
-            try:
+        # vider aussi la vue en cours de construction, jamais une vue mise en cache
+        parent = self._view_parent
+        current = ()
+        if parent is not self._view_slot and parent not in self._view_cache.values():
+            with contextlib.suppress(_TclError):
+                current = parent.winfo_children()
+        for w in self._stray_content_widgets(current):
+            with contextlib.suppress(_TclError):
                 w.destroy()
-            except Exception:
-                pass
-
-    def _set_active(self, btn):
-        if self._active_button and isinstance(self._active_button, tk.Button):
-            try:
-                self._active_button.config(bg=COULEUR_MENU_LATERAL)
-            except Exception:
-                pass
-        self._active_button = btn
-        if btn and isinstance(btn, tk.Button):
-            try:
-                btn.config(bg=COULEUR_MENU_SURVOL)
-            except Exception:
-                pass
 
     def toggle_menu(self):
-        if self._sidebar_visible:
-            try:
-                self.sidebar_container.forget()
-            except Exception:
-                try:
-                    self.sidebar_container.pack_forget()
-                except Exception:
-                    pass
-            try:
-                self.content_container.pack_forget()
-                self.content_container.pack(side="left", fill="both", expand=True)
-            except Exception:
-                pass
-            self._sidebar_visible = False
-        else:
-            try:
-                self.sidebar_container.pack(side="left", fill="y")
-            except Exception:
-                pass
-            try:
-                self.content_container.pack_forget()
-                self.content_container.pack(side="right", fill="both", expand=True)
-            except Exception:
-                pass
-            self._sidebar_visible = True
-        try:
-            if hasattr(self.controller, "update"):
-                self.controller.update()
+        # grid_remove garde les options de placement : .grid() suffit pour réafficher
+        with contextlib.suppress(_TclError):
+            if self._sidebar_visible:
+                self.sidebar_container.grid_remove()
             else:
-                self.update_idletasks()
-        except Exception:
-            pass
+                self.sidebar_container.grid()
+        # pas d'update() forcé : le réaffichage se fait au prochain tour de la boucle Tk
+        self._sidebar_visible = not self._sidebar_visible
 
     def _on_logout_button(self):
-        if not messagebox.askyesno("Déconnexion", "Êtes-vous sûr de vouloir vous déconnecter ?"):
+        if self._logout_pending:
             return
-        try:
+        if messagebox.askyesno("Déconnexion", "Êtes-vous sûr de vouloir vous déconnecter ?"):
+            # la boîte modale a relancé la boucle Tk : le démontage se fait sur une pile propre
+            self._logout_pending = True
+            self.after_idle(self._do_logout)
+
+    def _do_logout(self):
+        self._stop_network_checker()
+        # end_session / on_logout sont du code applicatif : toute erreur est ignorée
+        with contextlib.suppress(Exception):
             if hasattr(global_session, "end_session"):
                 global_session.end_session()
-        except Exception:
-            pass
+        self._first_contrib_id = None
+        with contextlib.suppress(Exception):
+            _lazy("invalidate_cached_passphrase")()
 
-        try:
+        with contextlib.suppress(Exception):
             if hasattr(self.controller, "destroy_view"):
                 self.controller.destroy_view("MainView")
-        except Exception:
-            pass
 
         if callable(self.on_logout):
-            try:
+            with contextlib.suppress(Exception):
                 self.on_logout()
-            except Exception:
-                pass
 
         try:
             if hasattr(self.controller, "show_view"):
                 self.controller.show_view("LoginView")
             else:
-                try:
-                    self.controller.destroy()
-                except Exception:
-                    pass
+                self.controller.destroy()
         except Exception:
-            try:
+            with contextlib.suppress(Exception):
                 self.controller.destroy()
-            except Exception:
-                pass
+
+    def destroy(self):
+        self._stop_network_checker()
+        for top, seq, funcid in getattr(self, "_toplevel_binds", ()):
+            _unbind_handler(top, seq, funcid)
+        self._toplevel_binds = []
+        try:
+            if self._db is not None:
+                self._db.close()
+        except Exception:
+            pass
+        self._db = None
+        return super().destroy()
 
     def _check_network_once(self, timeout=2) -> bool:
+        # une requête DNS en UDP : un paquet aller, un paquet retour, aucun état TCP
         try:
-            sock = socket.create_connection(("8.8.8.8", 53), timeout=timeout)
-            sock.close()
-            return True
+            sock = self._net_socket()
+            # identifiant neuf à chaque sonde : une réponse tardive à une sonde expirée,
+            # restée dans la socket réutilisée, est ignorée au lieu de compter comme « en ligne »
+            qid = os.urandom(2)
+            sock.send(qid + _DNS_QUERY_BODY)
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                sock.settimeout(remaining)
+                if sock.recv(512)[:2] == qid:
+                    return True
+        except socket.timeout:
+            return False
         except Exception:
+            # erreur ICMP, socket fermée par l'arrêt... : nouvelle socket à la prochaine sonde
+            self._close_net_socket()
             return False
 
-    def _start_network_checker(self, interval=10):
-        def worker():
-            while True:
-                try:
-                    ok = self._check_network_once(timeout=2)
-                    if ok != self._network_ok:
-                        self._network_ok = ok
-                        self.after(0, self._update_network_label)
-                except Exception:
-                    pass
-                time.sleep(interval)
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
+    def _net_socket(self):
+        """Socket UDP de la sonde, créée une fois et réutilisée (une seule sonde en vol à la fois)."""
+        sock = self._net_sock
+        if sock is None:
+            if self._net_stop.is_set():
+                raise OSError("network checker stopped")
+            family, socktype, proto, sockaddr = _net_probe_addr()
+            sock = socket.socket(family, socktype, proto)
+            # connect() en UDP ne fait que fixer la destination : send/recv simples ensuite
+            sock.connect(sockaddr)
+            self._net_sock = sock
+        return sock
+
+    def _close_net_socket(self):
+        sock, self._net_sock = getattr(self, "_net_sock", None), None
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.close()
+
+    def _start_network_checker(self, interval=_NET_MIN_INTERVAL, max_interval=_NET_MAX_INTERVAL):
+        # pas de sonde tant que la fenêtre est iconifiée/masquée (_viewable) ou n'a pas le focus (_checker_active)
+        self._checker_active = True
+        self._viewable = True
+        self._net_stop = threading.Event()
+        self._net_min, self._net_max, self._net_delay = interval, max_interval, interval
+        self._net_after = None
+        self._net_inflight = False
+        self._net_sock = None
+        self._last_rendered_net_ok = None
+        self._last_probe_ts = 0.0
+        self._toplevel_binds = []
+        self._net_top = None
+        try:
+            top = self._net_top = self.winfo_toplevel()
+            for seq, handler in (("<Map>", self._on_top_mapped), ("<FocusIn>", self._on_top_shown),
+                                 ("<Unmap>", self._on_top_unmapped), ("<FocusOut>", self._on_top_hidden)):
+                self._toplevel_binds.append((top, seq, top.bind(seq, handler, add="+")))
+        except Exception:
+            pass
+        self._net_after = self.after_idle(self._schedule_net_probe)
 
-    def _update_network_label(self):
-        if not hasattr(self, "_network_label") or self._network_label is None:
+    def _schedule_net_probe(self, force=False):
+        """Tick Tk : lance une sonde sur _BG_EXEC, ou réarme le minuteur si la vue est inactive."""
+        self._net_after = None
+        if self._net_stop.is_set():
+            return
+        if self._viewable and (self._checker_active or force) and not self._net_inflight:
+            self._net_inflight = True
+            self._last_probe_ts = time.monotonic()
+            fut = _BG_EXEC.submit(self._check_network_once, 2)
+            fut.add_done_callback(self._on_probe_done)
+            # le prochain tick est armé par _on_net_result
+            return
+        self._net_after = self.after(int(self._net_delay * 1000), self._schedule_net_probe)
+
+    def _on_probe_done(self, fut):
+        # thread de l'exécuteur : on ne fait que repasser le résultat à la boucle Tk
+        if self._net_stop.is_set():
             return
         try:
-            if self._network_ok:
-                self._network_label.config(text="Connexion internet est disponible", fg="#ffffff", bg="#2e7d32")
-                self._network_label.master.config(bg=COULEUR_BARRE_SUPERIEURE)
-                self._network_label.config(relief="raised")
-            else:
-                self._network_label.config(text="Connexion internet est indisponible", fg="#3a2f00", bg="#ffca28")
-                self._network_label.master.config(bg=COULEUR_BARRE_SUPERIEURE)
-                self._network_label.config(relief="raised")
+            ok = fut.result()
         except Exception:
+            ok = False
+        try:
+            self.after(0, self._on_net_result, ok)
+        except (RuntimeError, _TclError):
+            pass
+
+    def _on_net_result(self, ok):
+        self._net_inflight = False
+        if self._net_stop.is_set():
+            return
+        # état stable : l'intervalle double jusqu'à _net_max ; tout changement le réinitialise
+        if ok != self._network_ok:
+            self._network_ok = ok
+            self._net_delay = self._net_min
+            self._update_network_label()
+        else:
+            self._net_delay = min(self._net_delay * 2, self._net_max)
+        if self._net_after is None:
+            self._net_after = self.after(int(self._net_delay * 1000), self._schedule_net_probe)
+
+    def _stop_network_checker(self):
+        """Arrête la planification des sondes ; une sonde en cours est simplement ignorée."""
+        stop = getattr(self, "_net_stop", None)
+        if stop is not None:
+            stop.set()
+        pending, self._net_after = getattr(self, "_net_after", None), None
+        if pending is not None:
+            with contextlib.suppress(_TclError):
+                self.after_cancel(pending)
+        self._close_net_socket()
+
+    def _probe_now(self):
+        if self._net_inflight:
+            return
+        if self._net_after is not None:
+            with contextlib.suppress(_TclError):
+                self.after_cancel(self._net_after)
+        self._schedule_net_probe(force=True)
+
+    def _on_top_mapped(self, event):
+        if event.widget is not self._net_top:
+            return
+        # restauration de la fenêtre : le badge doit être juste tout de suite
+        self._viewable = self._checker_active = True
+        self._probe_now()
+
+    def _on_top_unmapped(self, event):
+        if event.widget is self._net_top:
+            self._viewable = False
+
+    def _on_top_shown(self, event):
+        if event.widget is not self._net_top:
+            return
+        self._checker_active = True
+        # retour du focus : sonde immédiate, sauf si la dernière date de moins de 5 s
+        if time.monotonic() - self._last_probe_ts >= 5.0:
+            self._probe_now()
+
+    def _on_top_hidden(self, event):
+        # un FocusOut du toplevel arrive aussi quand le focus passe à un de ses enfants
+        # (NotifyInferior, ex. un Entry) : ne suspendre que si l'application a vraiment perdu le focus
+        if event.widget is self._net_top:
+            self.after_idle(self._pause_if_unfocused)
+
+    def _pause_if_unfocused(self):
+        try:
+            focused = self.focus_displayof()
+        except (KeyError, _TclError):
+            focused = None
+        if focused is None:
+            self._checker_active = False
+
+    def _update_network_label(self):
+        label = getattr(self, "_network_label", None)
+        # vue détruite entre la sonde et ce rappel : test d'existence plutôt qu'une TclError
+        if not (label and label.winfo_exists()):
+            return
+        ok = bool(self._network_ok)
+        if self._last_rendered_net_ok == ok:
+            return
+        label.config(**_NET_LABEL_STYLES[ok])
+        self._last_rendered_net_ok = ok
+        try:
+            if str(label.master.cget("bg")) != COULEUR_BARRE_SUPERIEURE:
+                label.master.config(bg=COULEUR_BARRE_SUPERIEURE)
+        except _TclError:
             pass
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     try:
+        apply_tk_theme = _lazy("apply_tk_theme")
+        apply_matplotlib_theme = _lazy("apply_matplotlib_theme")
         if apply_tk_theme:
             apply_tk_theme(root)
         if apply_matplotlib_theme: